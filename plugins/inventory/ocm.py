@@ -0,0 +1,156 @@
+#!/usr/bin/python
+
+# Copyright 2023 Paul Czarkowski <pczarkow@redhat.com>
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+
+#     http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from __future__ import (absolute_import, division, print_function)
+
+__metaclass__ = type
+
+DOCUMENTATION = r'''
+---
+name: ocm
+
+short_description: OCM cluster inventory source
+
+version_added: "1.0.0"
+
+description:
+  - Builds an inventory of every cluster visible to the logged in OCM account.
+  - Clusters are listed with paginated calls and added to the inventory a page at a time.
+  - Hosts are grouped by region, state, product and whether they use hosted control planes.
+  - Uses the same OCM credentials as the ocm_* modules (run `rosa login` first).
+
+options:
+    plugin:
+        description: token that ensures this is a source file for the plugin.
+        required: true
+        choices: ['rh_mobb.rosa.ocm']
+    search:
+        description: OCM search expression used to filter clusters, for example "product.id = 'rosa'".
+        required: false
+        type: str
+    page_size:
+        description: number of clusters to fetch per API call.
+        required: false
+        type: int
+        default: 100
+
+extends_documentation_fragment:
+    - constructed
+    - inventory_cache
+
+author:
+    - Paul Czarkowski (@paulczar)
+'''
+
+EXAMPLES = r'''
+# ocm.yml
+plugin: rh_mobb.rosa.ocm
+search: "product.id = 'rosa'"
+cache: true
+cache_plugin: ansible.builtin.jsonfile
+cache_connection: /tmp/ocm_inventory
+cache_timeout: 600
+keyed_groups:
+  - key: ocm_cluster.version.raw_id
+    prefix: version
+'''
+
+from ansible.errors import AnsibleError
+from ansible.inventory.group import to_safe_group_name
+from ansible.plugins.inventory import BaseInventoryPlugin, Constructable, Cacheable
+
+try:
+    import ocm_client
+    from ansible_collections.rh_mobb.rosa.plugins.module_utils.ocm import OcmModule
+    from ansible_collections.rh_mobb.rosa.plugins.module_utils.ocm import OcmClusterModule
+    HAS_OCM = True
+except ImportError:
+    HAS_OCM = False
+
+
+class InventoryModule(BaseInventoryPlugin, Constructable, Cacheable):
+
+    NAME = 'rh_mobb.rosa.ocm'
+
+    def verify_file(self, path):
+        if super(InventoryModule, self).verify_file(path):
+            return path.endswith(('ocm.yml', 'ocm.yaml'))
+        return False
+
+    def fetch_clusters(self):
+        with OcmModule.api_client() as api_client:
+            api_instance = ocm_client.DefaultApi(api_client)
+            for cluster in OcmClusterModule.iter_clusters(api_instance,
+                                search=self.get_option('search'), size=self.get_option('page_size')):
+                yield api_client.sanitize_for_serialization(cluster)
+
+    def add_cluster(self, cluster):
+        name = cluster['name']
+        self.inventory.add_host(name)
+        self.inventory.set_variable(name, 'ocm_cluster_id', cluster['id'])
+        self.inventory.set_variable(name, 'ocm_cluster', cluster)
+
+        groups = [
+            "region_{}".format(cluster.get('region', {}).get('id', 'unknown')),
+            "state_{}".format(cluster.get('state', 'unknown')),
+            "product_{}".format(cluster.get('product', {}).get('id', 'unknown')),
+            "hypershift" if cluster.get('hypershift', {}).get('enabled') else "classic",
+        ]
+        for group in groups:
+            group = self.inventory.add_group(to_safe_group_name(group))
+            self.inventory.add_child(group, name)
+
+        strict = self.get_option('strict')
+        hostvars = self.inventory.get_host(name).get_vars()
+        self._set_composite_vars(self.get_option('compose'), hostvars, name, strict=strict)
+        self._add_host_to_composed_groups(self.get_option('groups'), hostvars, name, strict=strict)
+        self._add_host_to_keyed_groups(self.get_option('keyed_groups'), hostvars, name, strict=strict)
+
+    def parse(self, inventory, loader, path, cache=True):
+        super(InventoryModule, self).parse(inventory, loader, path, cache)
+        if not HAS_OCM:
+            raise AnsibleError("the ocm inventory plugin requires the ocm_client python library")
+        self._read_config_data(path)
+
+        cache_key = self.get_cache_key(path)
+        use_cache = self.get_option('cache') and cache
+        update_cache = self.get_option('cache') and not cache
+
+        clusters = None
+        if use_cache:
+            try:
+                clusters = self._cache[cache_key]
+            except KeyError:
+                update_cache = True
+
+        if clusters is not None:
+            for cluster in clusters:
+                self.add_cluster(cluster)
+            return
+
+        # only hold on to the full list if it has to go into the cache,
+        # otherwise each page is added and forgotten.
+        fetched = [] if update_cache else None
+        try:
+            for cluster in self.fetch_clusters():
+                self.add_cluster(cluster)
+                if fetched is not None:
+                    fetched.append(cluster)
+        except Exception as e:
+            raise AnsibleError("failed to list OCM clusters: {}".format(e))
+
+        if fetched is not None:
+            self._cache[cache_key] = fetched
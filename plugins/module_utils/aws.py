@@ -0,0 +1,184 @@
+#!/usr/bin/env python
+
+# Copyright 2023 Paul Czarkowski <pczarkow@redhat.com>
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+
+#     http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from __future__ import (absolute_import, division, print_function)
+
+__metaclass__ = type
+
+import os
+import time
+import hashlib
+import threading
+
+from .cache import cache_file, locked_cache, read_cache, is_fresh
+
+# One boto3 session per process, and one client per service and region on top
+# of it. Creating either means resolving credentials and loading service
+# models, which is far slower than the API call we usually want to make.
+# boto3 itself is only imported the first time something here is used.
+AWS_MAX_POOL_CONNECTIONS = 20
+
+# a subnet's zone, vpc and cidr never change, its route table association
+# can, so don't hang on to them for too long.
+SUBNET_CACHE_TTL = 900
+
+_session = None
+_clients = dict()
+_caller_identity = None
+# boto3 sessions aren't thread safe, the clients made from them are.
+_lock = threading.Lock()
+
+
+def aws_session():
+    global _session
+    with _lock:
+        if _session is None:
+            import boto3
+            # use the sts endpoint in our own region rather than the global one
+            os.environ.setdefault('AWS_STS_REGIONAL_ENDPOINTS', 'regional')
+            _session = boto3.session.Session()
+    return _session
+
+
+def aws_client(service, region=None):
+    key = (service, region)
+    session = aws_session()
+    with _lock:
+        if key not in _clients:
+            from botocore.config import Config
+            config = Config(
+                max_pool_connections=AWS_MAX_POOL_CONNECTIONS,
+                retries=dict(mode='standard'),
+            )
+            _clients[key] = session.client(service, region_name=region, config=config)
+    return _clients[key]
+
+
+def credential_fingerprint():
+    credentials = aws_session().get_credentials()
+    if credentials is None:
+        return None
+    frozen = credentials.get_frozen_credentials()
+    # never write the secret anywhere, the key id and session token are
+    # enough to tell one set of credentials from another.
+    return hashlib.sha256("{}|{}".format(frozen.access_key, frozen.token or '').encode('utf-8')).hexdigest()
+
+
+def identity_cache_ttl():
+    try:
+        return int(os.getenv('ROSA_ANSIBLE_IDENTITY_CACHE_TTL', '0'))
+    except ValueError:
+        return 0
+
+
+def caller_identity():
+    """sts get-caller-identity, once per process and optionally cached on disk.
+
+    Set ROSA_ANSIBLE_IDENTITY_CACHE_TTL to a number of seconds to share the
+    answer between module invocations using the same credentials.
+    """
+    global _caller_identity
+    if _caller_identity is not None:
+        return _caller_identity
+
+    ttl = identity_cache_ttl()
+    fingerprint = credential_fingerprint() if ttl else None
+    if fingerprint:
+        path = cache_file('aws-identity', fingerprint)
+        cached = read_cache(path)
+        if is_fresh(cached, ttl):
+            _caller_identity = cached['identity']
+            return _caller_identity
+
+    response = aws_client('sts').get_caller_identity()
+    _caller_identity = dict(Account=response['Account'], Arn=response['Arn'], UserId=response['UserId'])
+
+    if fingerprint:
+        with locked_cache(path) as cache:
+            cache['identity'] = _caller_identity
+            cache['cached_at'] = time.time()
+    return _caller_identity
+
+
+def normalize_subnet_ids(subnet_ids):
+    """Accept a list or a comma separated string of subnet ids."""
+    if not subnet_ids:
+        return []
+    if isinstance(subnet_ids, str):
+        subnet_ids = subnet_ids.split(',')
+    return list(dict.fromkeys(s.strip() for s in subnet_ids if s and s.strip()))
+
+
+def describe_subnets(subnet_ids, region):
+    """Describe subnets and their route tables, two paginated calls however many subnets."""
+    ec2 = aws_client('ec2', region)
+    subnets = dict()
+    for page in ec2.get_paginator('describe_subnets').paginate(SubnetIds=subnet_ids):
+        for subnet in page['Subnets']:
+            subnets[subnet['SubnetId']] = dict(
+                subnet_id=subnet['SubnetId'],
+                availability_zone=subnet['AvailabilityZone'],
+                availability_zone_id=subnet.get('AvailabilityZoneId'),
+                vpc_id=subnet['VpcId'],
+                cidr_block=subnet['CidrBlock'],
+                map_public_ip_on_launch=subnet.get('MapPublicIpOnLaunch', False),
+                route_table_id=None,
+            )
+
+    # subnets without an explicit association use their vpc's main route table
+    vpc_ids = sorted(set(subnet['vpc_id'] for subnet in subnets.values()))
+    main_route_tables = dict()
+    if vpc_ids:
+        paginator = ec2.get_paginator('describe_route_tables')
+        for page in paginator.paginate(Filters=[dict(Name='vpc-id', Values=vpc_ids)]):
+            for route_table in page['RouteTables']:
+                for association in route_table.get('Associations', []):
+                    if association.get('Main'):
+                        main_route_tables[route_table['VpcId']] = route_table['RouteTableId']
+                    elif association.get('SubnetId') in subnets:
+                        subnets[association['SubnetId']]['route_table_id'] = route_table['RouteTableId']
+    for subnet in subnets.values():
+        if not subnet['route_table_id']:
+            subnet['route_table_id'] = main_route_tables.get(subnet['vpc_id'])
+    return subnets
+
+
+def subnet_metadata(subnet_ids, region, cache_ttl=SUBNET_CACHE_TTL):
+    """Zone, vpc, cidr and route table of each subnet, returns (subnets, err).
+
+    Subnets seen recently come from the on-disk cache, the rest are fetched
+    together in one batch.
+    """
+    subnet_ids = normalize_subnet_ids(subnet_ids)
+    if not subnet_ids:
+        return dict(), None
+    path = cache_file('aws-subnets', region)
+    cached = read_cache(path) if cache_ttl else dict()
+    subnets = dict((i, cached[i]) for i in subnet_ids if is_fresh(cached.get(i), cache_ttl))
+    missing = [i for i in subnet_ids if i not in subnets]
+    if missing:
+        try:
+            fetched = describe_subnets(missing, region)
+        except Exception as e:
+            return None, str(e)
+        now = time.time()
+        for subnet in fetched.values():
+            subnet['cached_at'] = now
+        subnets.update(fetched)
+        if cache_ttl:
+            with locked_cache(path) as cache:
+                cache.update(fetched)
+    return subnets, None
@@ -0,0 +1,189 @@
+#!/usr/bin/env python
+
+# Copyright 2023 Paul Czarkowski <pczarkow@redhat.com>
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+
+#     http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from __future__ import (absolute_import, division, print_function)
+
+__metaclass__ = type
+
+# A tiny local token broker. The first module invocation that wants one forks
+# a daemon that listens on a unix socket, owns the OCM refresh token and keeps
+# a fresh access token ready. Every other fork just asks it for the current
+# token instead of doing its own exchange with SSO. The broker exits on its own
+# once nobody has asked it for anything in a while.
+
+import os
+import json
+import time
+import socket
+import threading
+
+from .cache import cache_dir, cache_key, locked_cache
+
+BROKER_IDLE_TIMEOUT = 900
+BROKER_START_TIMEOUT = 5
+BROKER_REFRESH_AHEAD = 120
+BROKER_RETRY_DELAY = 10
+
+
+def broker_enabled():
+    return os.getenv('OCM_TOKEN_BROKER', 'false').lower() in ['1', 'true', 'yes', 'on']
+
+
+def broker_socket(*parts):
+    return os.path.join(cache_dir(), "ocm-broker-{}.sock".format(cache_key(*parts)[:16]))
+
+
+def request_token(socket_path, timeout=2):
+    """Ask a running broker for its current token, returns None if there isn't one."""
+    if not os.path.exists(socket_path):
+        return None
+    try:
+        client = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        client.settimeout(timeout)
+        client.connect(socket_path)
+        client.sendall(b"token\n")
+        response = b""
+        while not response.endswith(b"\n"):
+            chunk = client.recv(65536)
+            if not chunk:
+                break
+            response += chunk
+        client.close()
+        return json.loads(response.decode('utf-8'))
+    except (socket.error, OSError, ValueError):
+        return None
+
+
+def ensure_broker(socket_path, refresh, expiry, idle_timeout=None):
+    """Return a token from the broker on socket_path, starting the broker if needed.
+
+    refresh is a callable returning a new access token and expiry a callable
+    returning the epoch a token expires at. Returns None if the broker can't
+    be reached so the caller can fall back to refreshing the token itself.
+    """
+    response = request_token(socket_path)
+    if response:
+        return response.get('access_token')
+
+    # only one fork gets to start the broker, the rest wait on the lock and
+    # then find it already listening.
+    with locked_cache(socket_path + ".lock"):
+        response = request_token(socket_path)
+        if response:
+            return response.get('access_token')
+        if not start_broker(socket_path, refresh, expiry, idle_timeout):
+            return None
+        deadline = time.time() + BROKER_START_TIMEOUT
+        while time.time() < deadline:
+            response = request_token(socket_path)
+            if response:
+                return response.get('access_token')
+            time.sleep(0.1)
+    return None
+
+
+def start_broker(socket_path, refresh, expiry, idle_timeout=None):
+    try:
+        pid = os.fork()
+    except OSError:
+        return False
+    if pid:
+        os.waitpid(pid, 0)
+        return True
+
+    # first child, detach from the module's session and fork again so the
+    # broker gets reparented and the module can exit normally.
+    try:
+        os.setsid()
+        if os.fork():
+            os._exit(0)
+        devnull = os.open(os.devnull, os.O_RDWR)
+        for fd in (0, 1, 2):
+            os.dup2(devnull, fd)
+        # don't hold on to the pipes ansible is reading the module result from
+        os.closerange(3, devnull)
+        os.closerange(devnull + 1, 1024)
+        TokenBroker(socket_path, refresh, expiry, idle_timeout).serve()
+    finally:
+        os._exit(0)
+
+
+class TokenBroker(object):
+    def __init__(self, socket_path, refresh, expiry, idle_timeout=None):
+        self.socket_path = socket_path
+        self.refresh = refresh
+        self.expiry = expiry
+        self.idle_timeout = idle_timeout or int(os.getenv('OCM_TOKEN_BROKER_IDLE', BROKER_IDLE_TIMEOUT))
+        self.lock = threading.Lock()
+        self.access_token = None
+        self.expires_at = 0
+        self.last_request = time.time()
+        self.stopped = threading.Event()
+
+    def refresh_token(self):
+        access_token = self.refresh()
+        with self.lock:
+            self.access_token = access_token
+            self.expires_at = self.expiry(access_token)
+
+    def refresher(self):
+        while not self.stopped.is_set():
+            with self.lock:
+                wait = self.expires_at - BROKER_REFRESH_AHEAD - time.time()
+            if wait > 0:
+                self.stopped.wait(min(wait, 30))
+                continue
+            try:
+                self.refresh_token()
+            except Exception:
+                self.stopped.wait(BROKER_RETRY_DELAY)
+
+    def serve(self):
+        self.refresh_token()
+        if os.path.exists(self.socket_path):
+            os.unlink(self.socket_path)
+        server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        server.bind(self.socket_path)
+        os.chmod(self.socket_path, 0o600)
+        server.listen(64)
+        server.settimeout(5)
+
+        thread = threading.Thread(target=self.refresher)
+        thread.daemon = True
+        thread.start()
+
+        try:
+            while time.time() - self.last_request < self.idle_timeout:
+                try:
+                    conn, _ = server.accept()
+                except socket.timeout:
+                    continue
+                self.last_request = time.time()
+                try:
+                    conn.settimeout(2)
+                    conn.recv(64)
+                    with self.lock:
+                        response = dict(access_token=self.access_token, expires_at=self.expires_at)
+                    conn.sendall(json.dumps(response).encode('utf-8') + b"\n")
+                except (socket.error, OSError):
+                    pass
+                finally:
+                    conn.close()
+        finally:
+            self.stopped.set()
+            server.close()
+            if os.path.exists(self.socket_path):
+                os.unlink(self.socket_path)
@@ -0,0 +1,100 @@
+#!/usr/bin/env python
+
+# Copyright 2023 Paul Czarkowski <pczarkow@redhat.com>
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+
+#     http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from __future__ import (absolute_import, division, print_function)
+
+__metaclass__ = type
+
+import os
+import json
+import time
+import fcntl
+import hashlib
+from contextlib import contextmanager
+
+# Every module invocation is a fresh process, so anything worth remembering
+# between tasks has to live on disk. Files in here are small json documents
+# guarded by an flock so that parallel forks don't trample each other.
+DEFAULT_CACHE_DIR = "~/.cache/rh_mobb.rosa"
+
+
+def cache_dir():
+    path = os.path.expanduser(os.getenv('ROSA_ANSIBLE_CACHE_DIR', DEFAULT_CACHE_DIR))
+    if not os.path.isdir(path):
+        os.makedirs(path, mode=0o700, exist_ok=True)
+    return path
+
+
+def cache_key(*parts):
+    return hashlib.sha256("|".join(str(p) for p in parts).encode('utf-8')).hexdigest()[:32]
+
+
+def cache_file(name, *parts):
+    if parts:
+        name = "{}-{}".format(name, cache_key(*parts))
+    return os.path.join(cache_dir(), "{}.json".format(name))
+
+
+@contextmanager
+def locked_cache(path):
+    """Hold an exclusive lock on a cache file for the duration of the block.
+
+    Yields a dict of the current contents. Changes made to the dict are
+    written back when the block exits without error.
+    """
+    fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+    with os.fdopen(fd, 'r+') as f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            try:
+                data = json.load(f)
+            except ValueError:
+                data = {}
+            if not isinstance(data, dict):
+                data = {}
+            original = json.dumps(data, sort_keys=True)
+            yield data
+            if json.dumps(data, sort_keys=True) != original:
+                f.seek(0)
+                f.truncate()
+                json.dump(data, f)
+                f.flush()
+                os.fsync(f.fileno())
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def read_cache(path):
+    """Read a cache file under a shared lock, returning {} if it's missing or corrupt."""
+    try:
+        with open(path, 'r') as f:
+            fcntl.flock(f, fcntl.LOCK_SH)
+            try:
+                data = json.load(f)
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+    except (IOError, OSError, ValueError):
+        return {}
+    if not isinstance(data, dict):
+        return {}
+    return data
+
+
+def is_fresh(entry, ttl, now=None):
+    if not entry or 'cached_at' not in entry:
+        return False
+    now = now or time.time()
+    return now - entry['cached_at'] < ttl
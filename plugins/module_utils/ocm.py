@@ -21,16 +21,27 @@ __metaclass__ = type
 import ocm_client
 from ocm_client.rest import ApiException
 import os
-from pathlib import Path
 import json
-import requests
 import re
+import time
+import base64
+import random
+import hashlib
+import threading
+import urllib3
+from email.utils import parsedate_tz, mktime_tz
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from .cache import cache_file, locked_cache, read_cache, is_fresh
+from .broker import broker_enabled, broker_socket, ensure_broker
+from .waiter import Waiter, EXPECTED_INSTALL_SECONDS, EXPECTED_UNINSTALL_SECONDS
+from .aws import caller_identity, normalize_subnet_ids, subnet_metadata
+from .ratelimit import TokenBucket
 
-# from botocore.exceptions import BotoCoreError
-# from botocore.exceptions import ClientError
-import boto3
-# except ImportError:
-#     pass  # Handled by AnsibleAWSModule
+# boto3 (via module_utils/aws.py) and requests are only imported when they're
+# first used. Every module is a fresh AnsiballZ process and most of them never
+# talk to AWS, or (with a cached token) to SSO, so there's no point paying for
+# those imports on every task.
 
 OCM_HOST = "https://api.openshift.com"
 
@@ -38,6 +49,74 @@ DEFAULT_COMPUTE_NODES_MULTI_AZ = 3
 DEFAULT_COMPUTE_NODES_SINGLE_AZ = 2
 DEFAULT_COMPUTE_MACHINE_TYPE = 'm5.xlarge'
 
+# refresh the cached access token this many seconds before it actually expires
+# so that a token handed to a module doesn't die halfway through its API calls.
+TOKEN_EXPIRY_MARGIN = 60
+
+# cluster ids never change once assigned, but a "not found" answer goes stale
+# as soon as somebody creates the cluster so only trust those for a short while.
+CLUSTER_ID_NEGATIVE_TTL = 30
+
+# how long a cached copy of the version catalog is trusted by default.
+VERSION_CACHE_TTL = 3600
+VERSION_PAGE_SIZE = 100
+
+# page size used when listing clusters, and how many names go into a single
+# "name in (...)" search so the query string stays a sane length.
+CLUSTER_PAGE_SIZE = 100
+CLUSTER_SEARCH_CHUNK = 50
+
+# what `summary: true` returns, enough to drive the roles in this collection
+# without shipping the whole cluster document back on every poll.
+CLUSTER_SUMMARY_FIELDS = [
+    'id',
+    'name',
+    'state',
+    'status',
+    'api.url',
+    'console.url',
+    'dns.base_domain',
+    'region.id',
+    'version.raw_id',
+    'hypershift.enabled',
+    'aws.sts.oidc_endpoint_url',
+    'aws.sts.operator_role_prefix',
+    'aws.sts.operator_iam_roles',
+    'aws.sts.oidc_config.id',
+]
+
+# every call to OCM goes through OcmApiClient, which retries transient errors
+# with jittered exponential backoff. requests that are safe to repeat are
+# retried on 5xx and connection errors, anything else (a POST creating
+# something) only when OCM turned it away with a 429 before acting on it.
+# OCM_API_MAX_RETRIES, OCM_API_RATE and OCM_API_BURST override these.
+API_MAX_RETRIES = 5
+API_BACKOFF_BASE = 1.0
+API_BACKOFF_CAP = 30
+API_RETRY_AFTER_CAP = 120
+API_RETRY_STATUSES = (429, 502, 503, 504)
+API_IDEMPOTENT_METHODS = ('GET', 'HEAD', 'OPTIONS', 'PUT', 'PATCH', 'DELETE')
+API_RATE = 10.0
+API_BURST = 20
+
+# the cluster groups ocm_idp can manage membership of, and how many users are
+# added or removed at once when syncing them.
+CLUSTER_GROUPS = ['cluster-admins', 'dedicated-admins']
+GROUP_PAGE_SIZE = 100
+GROUP_SYNC_CONCURRENCY = 5
+
+# what ocm_cluster reconciles on an existing cluster, as dotted paths into the
+# cluster document. everything else is fixed once the cluster is installed.
+RECONCILE_FIELDS = [
+    'proxy.http_proxy',
+    'proxy.https_proxy',
+    'proxy.no_proxy',
+    'additional_trust_bundle',
+    'nodes.compute',
+    'nodes.autoscale_compute.min_replicas',
+    'nodes.autoscale_compute.max_replicas',
+]
+
 # TODO get these from OCM API, vs hard coding them.
 OPERATOR_ROLES_CLASSIC = [
     dict(
@@ -112,7 +191,7 @@ def find_ocm_config():
         ".config/ocm/ocm.json"
     ]
     config = os.getenv('OCM_JSON', None)
-    home_directory = Path.home()
+    home_directory = os.path.expanduser("~")
     msg = "Looking for OCM config\n"
     msg += "Home is {}\n".format(home_directory)
     if not config:
@@ -128,13 +207,37 @@ def find_ocm_config():
         err = Exception(msg)
         raise err
 
+def jwt_claims(token):
+    # we only need a couple of claims, the signature is OCM's problem not ours.
+    try:
+        payload = token.split('.')[1]
+        payload += '=' * (-len(payload) % 4)
+        claims = json.loads(base64.urlsafe_b64decode(payload))
+    except (IndexError, ValueError, TypeError, AttributeError):
+        return {}
+    if not isinstance(claims, dict):
+        return {}
+    return claims
+
+def jwt_expiry(token):
+    try:
+        return int(jwt_claims(token)['exp'])
+    except (KeyError, ValueError, TypeError):
+        return 0
+
+def token_is_valid(token, margin=TOKEN_EXPIRY_MARGIN):
+    if not token:
+        return False
+    return jwt_expiry(token) - margin > time.time()
+
+def token_cache_enabled():
+    return os.getenv('OCM_TOKEN_CACHE', 'true').lower() not in ['0', 'false', 'no', 'off']
+
 def rosa_creator_arn():
-    client = boto3.client("sts")
-    return client.get_caller_identity()["Arn"]
+    return caller_identity()["Arn"]
 
 def aws_account_id():
-    client = boto3.client("sts")
-    return client.get_caller_identity()["Account"]
+    return caller_identity()["Account"]
 
 def rosa_compute_node_count(params):
     # return the requested compute node count if set
@@ -170,24 +273,18 @@ def rosa_compute_nodes(params, availability_zones):
     return compute_nodes
 
 def getAvailabilityZoneForSubnets(subnet_ids, region):
-    if type(subnet_ids) is str:
-        subnet_ids = subnet_ids.join(',')
-    if type(subnet_ids) is list:
-        if len(subnet_ids) == 0:
-            return None
+    subnet_ids = normalize_subnet_ids(subnet_ids)
+    if len(subnet_ids) == 0:
+        return None, None
+    subnets, err = subnet_metadata(subnet_ids, region)
+    if err:
+        return None, err
     availability_zones = []
-    try:
-        # Create a Boto3 EC2 client
-        ec2_client = boto3.client('ec2', region_name=region)
-        # Describe the subnet using the subnet_id
-        response = ec2_client.describe_subnets(SubnetIds=subnet_ids)
-        # Extract the availability zone from the response
-        for az in response['Subnets']:
-            if az['AvailabilityZone'] not in availability_zones:
-                availability_zones.append(az['AvailabilityZone'])
-    except Exception as e:
-        print(f"Error: {e}")
-        return None, e
+    for subnet_id in subnet_ids:
+        if subnet_id not in subnets:
+            return None, "subnet {} not found in {}".format(subnet_id, region)
+        if subnets[subnet_id]['availability_zone'] not in availability_zones:
+            availability_zones.append(subnets[subnet_id]['availability_zone'])
     return availability_zones, None
 
 def populateOperatorRoles(prefix, account_id, hcp):
@@ -210,6 +307,154 @@ def hcp_friendly_tags(tags):
     return tags
 
 
+def project_fields(data, fields):
+    """Return only the dotted paths in fields from data, keeping the nesting."""
+    if not data or not fields:
+        return data
+    projected = dict()
+    for field in fields:
+        source = data
+        keys = field.split('.')
+        for key in keys:
+            if not isinstance(source, dict) or source.get(key) is None:
+                break
+            source = source[key]
+        else:
+            target = projected
+            for key in keys[:-1]:
+                target = target.setdefault(key, dict())
+            target[keys[-1]] = source
+    return projected
+
+def error_id(e):
+    """The OCM error id out of an ApiException's json body, if there is one."""
+    try:
+        return str(json.loads(e.body).get('id'))
+    except (TypeError, ValueError, AttributeError):
+        return None
+
+def env_number(name, default, cast=int):
+    try:
+        return cast(os.getenv(name, default))
+    except ValueError:
+        return default
+
+def retry_after(e):
+    """Seconds asked for by an exception's Retry-After header, or None."""
+    headers = getattr(e, 'headers', None)
+    value = headers.get('Retry-After') if headers else None
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    date = parsedate_tz(value)
+    if date is None:
+        return None
+    return max(0.0, mktime_tz(date) - time.time())
+
+_api_limiter = None
+
+def api_limiter():
+    """The process wide token bucket shared by every OcmApiClient."""
+    global _api_limiter
+    if _api_limiter is None:
+        _api_limiter = TokenBucket(env_number('OCM_API_RATE', API_RATE, float),
+                                   env_number('OCM_API_BURST', API_BURST))
+    return _api_limiter
+
+def get_field(data, field):
+    """Value at a dotted path in data, None when any part of it is missing."""
+    for key in field.split('.'):
+        if not isinstance(data, dict):
+            return None
+        data = data.get(key)
+    return data
+
+def cluster_argument_spec():
+    """Options of a single cluster, shared by ocm_cluster and ocm_cluster_batch."""
+    return dict(
+        name=dict(type='str', required=True),
+        region=dict(type='str', required=False),
+        version=dict(type='str', required=False, default="4.8.2"),
+        channel_group=dict(type='str', required=False),
+        compute_machine_type=dict(type='str', required=False),
+        compute_nodes=dict(type='str', required=False),
+        min_replicas=dict(type='str', required=False),
+        max_replicas=dict(type='str', required=False),
+        machine_cidr=dict(type='str', required=False),
+        service_cidr=dict(type='str', required=False),
+        pod_cidr=dict(type='str', required=False),
+        host_prefix=dict(type='int', required=False),
+        http_proxy=dict(type='str', required=False),
+        https_proxy=dict(type='str', required=False),
+        no_proxy=dict(type='str', required=False),
+        additional_trust_bundle_file=dict(type='str', required=False),
+        subnet_ids=dict(type='str', required=False),
+        multi_az=dict(type='bool', required=False),
+        private=dict(type='bool', required=False),
+        private_link=dict(type='bool', required=False),
+        sts=dict(type='bool', required=False),
+        aws_account_id=dict(type='str', required=False),
+        disable_scp_checks=dict(type='bool', required=False),
+        disable_workload_monitoring=dict(type='bool', required=False, default=False),
+        wait=dict(type='bool', required=False),
+        wait_states=dict(type='list', elements='str', required=False),
+        wait_timeout=dict(type='int', required=False, default=3600),
+        state=dict(type='str', default='present', choices=['present','absent','dry-run','preflight']),
+        preflight=dict(type='bool', required=False, default=True),
+        reconcile=dict(type='bool', required=False, default=True),
+        force_reconcile=dict(type='bool', required=False, default=False),
+        plan_online=dict(type='bool', required=False, default=False),
+        availability_zones=dict(type='list', elements='str', required=False),
+        creator_arn=dict(type='str', required=False),
+        role_arn=dict(type='str', required=False),
+        support_role_arn=dict(type='str', required=False),
+        operator_roles_prefix=dict(type='str', required=False),
+        controlplane_iam_role=dict(type='str', required=False),
+        worker_iam_role=dict(type='str', required=False),
+        hosted_cp=dict(type=bool, required=False, default=False),
+        oidc_config_id=dict(type=str, required=False),
+        kms_key_arn=dict(type='str', required=False),
+        admin_username=dict(type='str', required=False, default='admin'),
+        admin_password=dict(type='str', required=False),
+        tags=dict(type='dict', required=False),
+        fields=dict(type='list', elements='str', required=False),
+        summary=dict(type='bool', required=False, default=False),
+    )
+
+def cluster_fields(params):
+    if params.get('summary'):
+        return CLUSTER_SUMMARY_FIELDS + (params.get('fields') or [])
+    return params.get('fields')
+
+def version_key(raw_id):
+    """Sort key for openshift versions, releases sort after their own prereleases."""
+    release, _, prerelease = str(raw_id).partition('-')
+    numbers = []
+    for part in release.split('.'):
+        try:
+            numbers.append(int(part))
+        except ValueError:
+            numbers.append(-1)
+    while len(numbers) < 3:
+        numbers.append(0)
+    return (tuple(numbers), 0 if prerelease else 1, prerelease)
+
+def version_matches(raw_id, version):
+    # "4.1" should match 4.1.x but not 4.14.x
+    if not version:
+        return True
+    return raw_id == version or raw_id.startswith(version + '.') or raw_id.startswith(version + '-')
+
+def search_quote(value):
+    return "'{}'".format(str(value).replace("'", "''"))
+
+def chunks(items, size):
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
 def api_visibility(private):
     if private:
         return ocm_client.ClusterAPI(
@@ -217,36 +462,194 @@ def api_visibility(private):
         )
     return ocm_client.ClusterAPI()
 
+class OcmApiClient(ocm_client.ApiClient):
+    """ApiClient that rate limits and retries every request it sends.
+
+    stats counts requests, retries, 429s and the seconds spent waiting on the
+    rate limiter and backing off. It's updated in place, so a module can put
+    it in its result up front and have it reported however the module exits.
+
+    Access tokens only last a few minutes, so a client kept around for a long
+    wait swaps in a fresh one before the current one expires, and once more
+    if OCM refuses it with a 401.
+    """
+
+    def __init__(self, configuration=None, limiter=None, max_retries=None, sleep=time.sleep):
+        super(OcmApiClient, self).__init__(configuration)
+        self.limiter = limiter or api_limiter()
+        self.max_retries = env_number('OCM_API_MAX_RETRIES', API_MAX_RETRIES) if max_retries is None else max_retries
+        self.sleep = sleep
+        self.stats = dict(requests=0, retries=0, rate_limited=0, failed=0, token_refreshes=0,
+                          throttled_seconds=0.0, backoff_seconds=0.0)
+        self.stats_lock = threading.Lock()
+        self.token_lock = threading.Lock()
+
+    def count(self, **counters):
+        with self.stats_lock:
+            for name, value in counters.items():
+                self.stats[name] = round(self.stats[name] + value, 3)
+
+    def retry_delay(self, method, status, after, attempt):
+        """Seconds to wait before retrying, or None if the request can't be retried."""
+        if attempt >= self.max_retries:
+            return None
+        if status != 429:
+            if method.upper() not in API_IDEMPOTENT_METHODS:
+                return None
+            if status is not None and status not in API_RETRY_STATUSES:
+                return None
+        if after is not None:
+            return min(after, API_RETRY_AFTER_CAP)
+        return random.uniform(0, min(API_BACKOFF_CAP, API_BACKOFF_BASE * 2 ** attempt))
+
+    def access_token(self, refused=None):
+        """The token to send, refreshed if it's about to expire or is the one OCM just refused."""
+        with self.token_lock:
+            token = self.configuration.access_token
+            if refused is None and (not jwt_expiry(token) or token_is_valid(token)):
+                return token
+            if refused is not None and token != refused:
+                # another thread has already replaced it
+                return token
+            token = OcmModule.ocm_access_token(refused)
+            self.configuration.access_token = token
+            self.count(token_refreshes=1)
+            return token
+
+    def authorize(self, token, args, kwargs):
+        # the generated client builds the Authorization header before calling
+        # request(), so a refreshed token has to be put in there as well.
+        headers = kwargs.get('headers')
+        if headers is None and len(args) > 1:
+            headers = args[1]
+        if headers is not None:
+            headers['Authorization'] = 'Bearer {}'.format(token)
+
+    def request(self, method, url, *args, **kwargs):
+        attempt = 0
+        refused = None
+        while True:
+            token = self.access_token(refused)
+            self.authorize(token, args, kwargs)
+            self.count(requests=1, throttled_seconds=self.limiter.acquire())
+            try:
+                return super(OcmApiClient, self).request(method, url, *args, **kwargs)
+            except ApiException as e:
+                if e.status == 401 and refused is None:
+                    # once only, a second 401 with a fresh token is a real one
+                    refused = token
+                    continue
+                if e.status == 429:
+                    self.count(rate_limited=1)
+                error, delay = e, self.retry_delay(method, e.status, retry_after(e), attempt)
+            except urllib3.exceptions.HTTPError as e:
+                # connection reset, timeout and friends, no response at all
+                error, delay = e, self.retry_delay(method, None, None, attempt)
+            if delay is None:
+                self.count(failed=1)
+                raise error
+            attempt += 1
+            self.count(retries=1, backoff_seconds=delay)
+            self.sleep(delay)
+
 class OcmModule(object):
+    def api_client(limiter=None):
+        return OcmApiClient(OcmModule.ocm_authenticate(), limiter=limiter)
+
     def ocm_authenticate():
-        f = open(find_ocm_config(),)
-        user = json.load(f)
+        configuration = ocm_client.Configuration(
+            host = OCM_HOST
+        )
+
+        configuration.access_token = OcmModule.ocm_access_token()
+        return configuration
+
+    def ocm_config():
+        with open(find_ocm_config(),) as f:
+            return json.load(f)
+
+    def refresh_access_token(user):
+        import requests
         auth = (user['client_id'], user['access_token'])
         params = {
             "grant_type": "refresh_token",
             "refresh_token": user['refresh_token']
         }
         response = requests.post(user['token_url'], auth=auth, data=params)
-        access_token = response.json()['access_token']
+        return response.json()['access_token']
 
-        configuration = ocm_client.Configuration(
-            host = OCM_HOST
-        )
+    def ocm_access_token(refused=None):
+        """A valid access token, never refused (one OCM has just answered 401 to)."""
+        user = OcmModule.ocm_config()
+        refresh_fingerprint = hashlib.sha256(user['refresh_token'].encode('utf-8')).hexdigest()
 
-        configuration.access_token = access_token
-        return configuration
+        if broker_enabled():
+            access_token = OcmModule.broker_access_token(user, refresh_fingerprint)
+            if token_is_valid(access_token) and access_token != refused:
+                return access_token
+
+        if not token_cache_enabled():
+            return OcmModule.refresh_access_token(user)
+
+        # the cache is shared by every fork, holding the lock across the refresh
+        # means only one of them talks to SSO and the rest pick up its token.
+        with locked_cache(cache_file('ocm-token', user['client_id'], user['token_url'])) as cache:
+            if cache.get('refresh_fingerprint') == refresh_fingerprint and token_is_valid(cache.get('access_token')) \
+                    and cache['access_token'] != refused:
+                return cache['access_token']
+            access_token = OcmModule.refresh_access_token(user)
+            cache['access_token'] = access_token
+            cache['expires_at'] = jwt_expiry(access_token)
+            cache['refresh_fingerprint'] = refresh_fingerprint
+        return access_token
+
+    def broker_access_token(user, refresh_fingerprint):
+        # the broker re-reads ocm.json on every refresh so it follows the
+        # refresh token around if the ocm/rosa cli rotates it.
+        socket_path = broker_socket(user['client_id'], user['token_url'], refresh_fingerprint)
+        try:
+            return ensure_broker(
+                socket_path,
+                refresh=lambda: OcmModule.refresh_access_token(OcmModule.ocm_config()),
+                expiry=jwt_expiry,
+            )
+        except (IOError, OSError):
+            return None
 
 class OcmClusterModule(object):
 
-    def get_cluster_id(api_instance, cluster_name):
+    def cluster_id_cache(api_instance):
+        # cluster names are only unique within an organization, so keep a
+        # cache per OCM user.
+        claims = jwt_claims(api_instance.api_client.configuration.access_token)
+        return cache_file('ocm-cluster-ids', OCM_HOST, claims.get('sub', ''))
+
+    def remember_cluster_id(api_instance, cluster_name, cluster_id):
+        with locked_cache(OcmClusterModule.cluster_id_cache(api_instance)) as cache:
+            cache[cluster_name] = dict(id=cluster_id, cached_at=time.time())
+
+    def forget_cluster_id(api_instance, cluster_id):
+        with locked_cache(OcmClusterModule.cluster_id_cache(api_instance)) as cache:
+            for name in [name for name, entry in cache.items() if entry.get('id') == cluster_id]:
+                del cache[name]
+
+    def get_cluster_id(api_instance, cluster_name, use_cache=True, use_negative=True):
+        if use_cache:
+            entry = read_cache(OcmClusterModule.cluster_id_cache(api_instance)).get(cluster_name)
+            if entry and entry.get('id'):
+                return entry['id'], None
+            if entry and use_negative and is_fresh(entry, CLUSTER_ID_NEGATIVE_TTL):
+                return None, None
         search = "name = '{}'".format(cluster_name)
         try:
             api_response = api_instance.api_clusters_mgmt_v1_clusters_get(search=search, size="1")
         except ApiException as e:
             return None, "Exception when calling DefaultApi->api_clusters_mgmt_v1_clusters_cluster_id_get: {}\n".format(e)
         if len(api_response.items) > 0:
+            OcmClusterModule.remember_cluster_id(api_instance, cluster_name, api_response.items[0].id)
             return api_response.items[0].id, None
         else:
+            OcmClusterModule.remember_cluster_id(api_instance, cluster_name, None)
             return None, None
             # module.fail_json("Exception when calling DefaultApi->api_clusters_mgmt_v1_clusters_cluster_id_get: %s\n" % e)
 
@@ -254,21 +657,198 @@ class OcmClusterModule(object):
         try:
             cluster_info = api_instance.api_clusters_mgmt_v1_clusters_cluster_id_get(cluster_id)
         except ApiException as e:
+            if e.status == 404:
+                OcmClusterModule.forget_cluster_id(api_instance, cluster_id)
             return None, "Exception when calling DefaultApi->api_clusters_mgmt_v1_clusters_cluster_id_get: {}\n".format(e)
         # if not len(cluster_info.to_dict()) == 1:
         #     return None, "Incorrect number of cluster results:\n {}".format(cluster_info.to_str())
         return cluster_info.to_dict(), None
 
-    def create_cluster(api_instance, params):
+    def lookup_cluster(api_instance, cluster_name, use_negative=True):
+        """Resolve a cluster by name and fetch it, returns (cluster_id, cluster_info, err).
+
+        A cached id that has since gone away (404) is dropped and the name is
+        searched again, in case the cluster was deleted and recreated.
+        """
+        cluster_id, err = OcmClusterModule.get_cluster_id(api_instance, cluster_name, use_negative=use_negative)
+        if err or not cluster_id:
+            return None, None, err
+        try:
+            cluster_info = api_instance.api_clusters_mgmt_v1_clusters_cluster_id_get(cluster_id)
+        except ApiException as e:
+            if e.status != 404:
+                return None, None, "Exception when calling DefaultApi->api_clusters_mgmt_v1_clusters_cluster_id_get: {}\n".format(e)
+            OcmClusterModule.forget_cluster_id(api_instance, cluster_id)
+            cluster_id, err = OcmClusterModule.get_cluster_id(api_instance, cluster_name, use_cache=False)
+            if err or not cluster_id:
+                return None, None, err
+            cluster_info, err = OcmClusterModule.get_cluster_info(api_instance, cluster_id)
+            return cluster_id, cluster_info, err
+        return cluster_id, cluster_info.to_dict(), None
+
+    def get_cluster_status(api_instance, cluster_id):
+        """Fetch just the status document of a cluster, returns (status, err).
+
+        status is None when the cluster doesn't exist (any more).
+        """
+        try:
+            status = api_instance.api_clusters_mgmt_v1_clusters_cluster_id_status_get(cluster_id)
+        except ApiException as e:
+            if e.status == 404:
+                OcmClusterModule.forget_cluster_id(api_instance, cluster_id)
+                return None, None
+            return None, "Exception when calling DefaultApi->api_clusters_mgmt_v1_clusters_cluster_id_status_get: {}\n".format(e)
+        return status.to_dict(), None
 
-        availability_zones, err = getAvailabilityZoneForSubnets(params['subnet_ids'].split(','), params['region'])
+    def wait_for_cluster(api_instance, cluster_id, states, timeout, expected=None, on_poll=None):
+        """Wait in-process for a cluster to reach one of states, returns (cluster_info, waiter, err).
+
+        A state of 'absent' waits for the cluster to be gone. Waiting also
+        stops if the cluster goes into 'error', or with an error if it
+        disappears while waiting for anything else. Only the small status document
+        is polled, the full cluster is fetched once at the end.
+        """
+        if expected is None:
+            expected = EXPECTED_UNINSTALL_SECONDS if 'absent' in states else EXPECTED_INSTALL_SECONDS
+        waiter = Waiter(timeout, expected)
+        errors = []
+
+        def poll():
+            status, err = OcmClusterModule.get_cluster_status(api_instance, cluster_id)
+            if err:
+                errors.append(err)
+                return None, None
+            if status is None:
+                return 'absent', {}
+            if on_poll:
+                on_poll(status['state'])
+            return status['state'], status
+
+        state, status = waiter.wait(poll, lambda state: errors or state in states or state in ('error', 'absent'))
+        if errors:
+            return None, waiter, errors[-1]
+        if state == 'absent' and 'absent' not in states:
+            return None, waiter, "cluster {} no longer exists".format(cluster_id)
+        if state == 'absent':
+            return {}, waiter, None
+        cluster_info, err = OcmClusterModule.get_cluster_info(api_instance, cluster_id)
+        return cluster_info, waiter, err
+
+    def get_cluster_logs(api_instance, cluster_id, log_type='install', offset=0):
+        """Fetch install or uninstall logs starting at a line offset, returns (content, err).
+
+        Logs that don't exist yet come back as an empty string.
+        """
+        get_logs = getattr(api_instance, "api_clusters_mgmt_v1_clusters_cluster_id_logs_{}_get".format(log_type))
+        try:
+            log_entry = get_logs(cluster_id, offset=offset)
+        except ApiException as e:
+            if e.status == 404:
+                return "", None
+            return None, "Exception when calling DefaultApi->api_clusters_mgmt_v1_clusters_cluster_id_logs_{}_get: {}\n".format(log_type, e)
+        return log_entry.content or "", None
+
+    def append_cluster_logs(api_instance, cluster_id, log_type, dest, offset=None, truncate=False):
+        """Append any log lines not already in dest, returns (details, err).
+
+        Without an explicit offset we carry on from however many lines dest
+        already holds, so repeated calls only transfer what's new. truncate
+        empties dest first, for callers that track the offset themselves.
+        """
+        if offset is None:
+            offset = 0
+            if os.path.isfile(dest):
+                with open(dest, 'rb') as f:
+                    offset = sum(1 for _ in f)
+        content, err = OcmClusterModule.get_cluster_logs(api_instance, cluster_id, log_type, offset)
         if err:
             return None, err
+        lines = content.splitlines(True)
+        if lines or truncate:
+            with open(dest, 'w' if truncate else 'a') as f:
+                f.write(content)
+        return dict(
+            dest=dest,
+            offset=offset + len(lines),
+            lines_written=len(lines),
+            bytes_written=len(content.encode('utf-8')),
+            new_lines=lines,
+        ), None
+
+    def iter_clusters(api_instance, search=None, size=CLUSTER_PAGE_SIZE):
+        """Yield clusters one page at a time rather than loading the whole list."""
+        page = 1
+        while True:
+            kwargs = dict(page=page, size=size)
+            if search:
+                kwargs['search'] = search
+            api_response = api_instance.api_clusters_mgmt_v1_clusters_get(**kwargs)
+            items = api_response.items or []
+            for item in items:
+                yield item
+            if len(items) < size or (api_response.total and page * size >= api_response.total):
+                return
+            page += 1
+
+    def search_clusters(api_instance, names=None, search=None):
+        """Fetch many clusters with as few list calls as possible.
+
+        Returns a dict of cluster name to cluster info. When names are given,
+        they're resolved in batches with "name in (...)" and optionally
+        narrowed further by search.
+        """
+        queries = []
+        if names:
+            for batch in chunks(list(dict.fromkeys(names)), CLUSTER_SEARCH_CHUNK):
+                query = "name in ({})".format(", ".join(search_quote(name) for name in batch))
+                if search:
+                    query = "({}) AND {}".format(search, query)
+                queries.append(query)
+        else:
+            queries.append(search)
+
+        clusters = dict()
+        try:
+            for query in queries:
+                for cluster in OcmClusterModule.iter_clusters(api_instance, search=query):
+                    clusters[cluster.name] = cluster.to_dict()
+        except ApiException as e:
+            return None, "Exception when calling DefaultApi->api_clusters_mgmt_v1_clusters_get: {}\n".format(e)
+
+        with locked_cache(OcmClusterModule.cluster_id_cache(api_instance)) as cache:
+            for name, cluster in clusters.items():
+                cache[name] = dict(id=cluster['id'], cached_at=time.time())
+            # a name missing from a narrowed search may well exist, only an
+            # unfiltered lookup proves it doesn't.
+            if not search:
+                for name in (names or []):
+                    if name not in clusters:
+                        cache[name] = dict(id=None, cached_at=time.time())
+        return clusters, None
+
+    def build_cluster(api_instance, params, offline=False):
+        """Build the ocm_client.Cluster to create, returns (cluster, err).
+
+        When offline, nothing is looked up in OCM or AWS. Availability zones
+        and the creator ARN come from params (and are left out if not given)
+        and the oidc config is referenced by id only.
+        """
+        if offline:
+            availability_zones = params.get('availability_zones') or None
+            creator_arn = params.get('creator_arn')
+        else:
+            availability_zones, err = getAvailabilityZoneForSubnets(params['subnet_ids'], params['region'])
+            if err:
+                return None, err
+            creator_arn = rosa_creator_arn()
         htpasswd = None
         additional_trust_bundle = None
         if params['additional_trust_bundle_file']:
-            additional_trust_bundle = Path(params['additional_trust_bundle_file']).read_text()
-        if params['oidc_config_id']:
+            with open(params['additional_trust_bundle_file']) as f:
+                additional_trust_bundle = f.read()
+        if params['oidc_config_id'] and offline:
+            oidc_config = ocm_client.OidcConfig(id = params['oidc_config_id'])
+        elif params['oidc_config_id']:
             oidc_config, err = OcmOidcConfig.get(api_instance, params['oidc_config_id'])
             if err:
                 return None, err
@@ -285,7 +865,7 @@ class OcmClusterModule(object):
             # billing account id must be set (todo make it configurable)
             billing_account_id = params['aws_account_id']
             # currently HCP can't take special chars in tag values
-            params['tags'] = hcp_friendly_tags(params['tags'])
+            params['tags'] = hcp_friendly_tags(params['tags'] or {})
         else:
             instance_iam_roles.master_role_arn = params['controlplane_iam_role']
             billing_account_id = None
@@ -311,7 +891,7 @@ class OcmClusterModule(object):
                 # audit_log
                 etcd_encryption = ocm_client.AwsEtcdEncryption(),
                 private_link = params['private_link'],
-                subnet_ids = params['subnet_ids'].split(','),
+                subnet_ids = normalize_subnet_ids(params['subnet_ids']) or None,
                 tags = params['tags'],
             ),
             ccs = ocm_client.CCS(
@@ -347,7 +927,7 @@ class OcmClusterModule(object):
                 id = 'rosa'
             ),
             properties = dict(
-                rosa_creator_arn = rosa_creator_arn(),
+                rosa_creator_arn = creator_arn,
                 rosa_provisioner = 'ocm-ansible-module'
             ),
             proxy = ocm_client.Proxy(
@@ -367,23 +947,254 @@ class OcmClusterModule(object):
 
         )
 
-        try:
-            # Check if kms_key_arn is not null or empty and remove it from param dict
-            # if kms_key_arn is == '' (user does not require a custom kms key) install will fail if kms_key_arn param is not removed
-            if cluster.aws.kms_key_arn == '':
-               cluster.aws.__setattr__("kms_key_arn", None)
+        # Check if kms_key_arn is not null or empty and remove it from param dict
+        # if kms_key_arn is == '' (user does not require a custom kms key) install will fail if kms_key_arn param is not removed
+        if cluster.aws.kms_key_arn == '':
+           cluster.aws.__setattr__("kms_key_arn", None)
+        return cluster, None
 
+    def create_cluster(api_instance, params):
+        cluster, err = OcmClusterModule.build_cluster(api_instance, params)
+        if err:
+            return None, err
+        try:
             cluster_create = api_instance.api_clusters_mgmt_v1_clusters_post(cluster=cluster)
         except ApiException as e:
             return cluster.to_dict(), "Exception when calling DefaultApi->api_clusters_mgmt_v1_clusters_post: {}\n".format(e)
+        OcmClusterModule.remember_cluster_id(api_instance, params['name'], cluster_create.id)
         return cluster_create.to_dict(), None
         # return cluster.to_dict(), None
 
+    def desired_spec(params):
+        """The RECONCILE_FIELDS a task sets, as a dict of dotted path to value.
+
+        Only options that were actually given end up in here, so anything left
+        to its default (or changed outside of ansible) isn't touched.
+        """
+        spec = dict()
+        for field in ['http_proxy', 'https_proxy', 'no_proxy']:
+            if params.get(field) is not None:
+                spec['proxy.' + field] = params[field]
+        if params.get('additional_trust_bundle_file'):
+            with open(params['additional_trust_bundle_file']) as f:
+                spec['additional_trust_bundle'] = f.read()
+        # the default machine pool can only be edited this way on classic clusters
+        if not params.get('hosted_cp'):
+            if params.get('min_replicas') and params.get('max_replicas'):
+                spec['nodes.autoscale_compute.min_replicas'] = int(params['min_replicas'])
+                spec['nodes.autoscale_compute.max_replicas'] = int(params['max_replicas'])
+            elif params.get('compute_nodes'):
+                spec['nodes.compute'] = int(params['compute_nodes'])
+        return spec
+
+    def spec_hash(spec):
+        return hashlib.sha256(json.dumps(spec, sort_keys=True).encode('utf-8')).hexdigest()
+
+    def spec_cache(api_instance):
+        claims = jwt_claims(api_instance.api_client.configuration.access_token)
+        return cache_file('ocm-cluster-specs', OCM_HOST, claims.get('sub', ''))
+
+    def diff_cluster(spec, cluster_info, trust_bundle=True):
+        """Compare a desired spec with the live cluster, returns {field: {current, desired}}."""
+        diff = dict()
+        for field in RECONCILE_FIELDS:
+            if field not in spec:
+                continue
+            if field == 'additional_trust_bundle' and not trust_bundle:
+                continue
+            current = get_field(cluster_info, field)
+            desired = spec[field]
+            if field == 'additional_trust_bundle':
+                # OCM never hands the bundle back, so it's always sent once
+                # the spec has changed. don't echo certificates into the diff.
+                desired = 'sha256:' + hashlib.sha256(desired.encode('utf-8')).hexdigest()
+            elif (current or None) == (desired or None):
+                continue
+            diff[field] = dict(current=current, desired=desired)
+        return diff
+
+    def patch_body(spec, diff, cluster_info):
+        """The smallest ocm_client.Cluster that applies diff."""
+        cluster = ocm_client.Cluster()
+        if any(field.startswith('proxy.') for field in diff):
+            # a proxy is patched as a whole, keep the parts that haven't changed
+            # or aren't in the spec, or they'd be cleared.
+            proxy = dict()
+            for field in ('http_proxy', 'https_proxy', 'no_proxy'):
+                key = 'proxy.' + field
+                proxy[field] = spec[key] if key in spec else get_field(cluster_info, key)
+            cluster.proxy = ocm_client.Proxy(**proxy)
+        if 'additional_trust_bundle' in diff:
+            cluster.additional_trust_bundle = spec['additional_trust_bundle']
+        if any(field.startswith('nodes.autoscale_compute.') for field in diff):
+            cluster.nodes = ocm_client.ClusterNodes(
+                autoscale_compute = ocm_client.MachinePoolAutoscaling(
+                    min_replicas = spec['nodes.autoscale_compute.min_replicas'],
+                    max_replicas = spec['nodes.autoscale_compute.max_replicas'],
+                )
+            )
+        elif 'nodes.compute' in diff:
+            cluster.nodes = ocm_client.ClusterNodes(compute = spec['nodes.compute'])
+        return cluster
+
+    def reconcile_cluster(api_instance, cluster_id, cluster_info, params, force=False):
+        """Bring an existing cluster in line with params, returns (cluster_info, report, err).
+
+        The hash of the last spec applied to each cluster is kept locally, when
+        it matches nothing is compared or sent. Otherwise the changed fields
+        go out in a single PATCH.
+
+        OCM never returns the trust bundle, so it can't be compared. It's only
+        sent when an earlier spec was applied from here and has since changed,
+        or with force, otherwise every controller without the cache would
+        PATCH it on every run.
+        """
+        spec = OcmClusterModule.desired_spec(params)
+        digest = OcmClusterModule.spec_hash(spec)
+        report = dict(spec_hash=digest, diff=dict(), skipped=False, patched=False)
+        path = OcmClusterModule.spec_cache(api_instance)
+        stored = read_cache(path).get(cluster_id)
+        if not force and stored and stored.get('spec_hash') == digest:
+            report['skipped'] = True
+            return cluster_info, report, None
+        if cluster_info.get('state') != 'ready':
+            # not an error, just too early (or late) to change anything
+            report['skipped'] = True
+            report['reason'] = "cluster is {}".format(cluster_info.get('state'))
+            return cluster_info, report, None
+
+        report['diff'] = OcmClusterModule.diff_cluster(spec, cluster_info,
+                             trust_bundle=force or stored is not None)
+        if report['diff']:
+            try:
+                patched = api_instance.api_clusters_mgmt_v1_clusters_cluster_id_patch(cluster_id,
+                              cluster=OcmClusterModule.patch_body(spec, report['diff'], cluster_info))
+            except ApiException as e:
+                return cluster_info, report, "Exception when calling DefaultApi->api_clusters_mgmt_v1_clusters_cluster_id_patch: {}\n".format(e)
+            report['patched'] = True
+            cluster_info = patched.to_dict()
+        with locked_cache(path) as cache:
+            cache[cluster_id] = dict(spec_hash=digest, cached_at=time.time())
+        return cluster_info, report, None
+
+class OcmPreflightModule(object):
+    """Cheap checks that catch a bad cluster spec before OCM accepts the create.
+
+    Each check returns (ok, message). They're independent lookups so they
+    all run at once and every failure is reported together.
+    """
+
+    def check_region(api_instance, params):
+        region = api_instance.api_clusters_mgmt_v1_cloud_providers_cloud_provider_id_regions_region_id_get('aws', params['region'])
+        if not region.enabled:
+            return False, "region {} is not enabled".format(params['region'])
+        if params['hosted_cp'] and not region.supports_hypershift:
+            return False, "region {} does not support hosted control planes".format(params['region'])
+        return True, "region {} is available".format(params['region'])
+
+    def check_version(api_instance, params):
+        version = api_instance.api_clusters_mgmt_v1_versions_version_id_get("openshift-v{}".format(params['version']))
+        if not version.enabled:
+            return False, "version {} is not enabled".format(params['version'])
+        if params['hosted_cp'] and not version.hosted_control_plane_enabled:
+            return False, "version {} is not available for hosted control planes".format(params['version'])
+        if not params['hosted_cp'] and not version.rosa_enabled:
+            return False, "version {} is not available for ROSA".format(params['version'])
+        return True, "version {} is available".format(params['version'])
+
+    def check_flavour(api_instance, params):
+        api_instance.api_clusters_mgmt_v1_flavours_flavour_id_get('osd-4')
+        return True, "flavour osd-4 is available"
+
+    def check_machine_type(api_instance, params):
+        machine_type = params['compute_machine_type'] or DEFAULT_COMPUTE_MACHINE_TYPE
+        cloud_provider_data = ocm_client.CloudProviderData(
+            aws = ocm_client.AWS(
+                sts = ocm_client.STS(
+                    role_arn = params['role_arn'],
+                ),
+            ),
+            region = ocm_client.CloudRegion(
+                id = params['region'],
+            ),
+        )
+        response = api_instance.api_clusters_mgmt_v1_aws_inquiries_machine_types_post(
+                        cloud_provider_data=cloud_provider_data, size=-1)
+        if machine_type not in [item.id for item in (response.items or [])]:
+            return False, "machine type {} is not available in {}".format(machine_type, params['region'])
+        return True, "machine type {} is available".format(machine_type)
+
+    def check_quota(api_instance, params):
+        account = api_instance.api_accounts_mgmt_v1_current_account_get()
+        response = api_instance.api_accounts_mgmt_v1_organizations_org_id_quota_cost_get(
+                        account.organization.id, fetch_related_resources=True, size=-1)
+        exhausted = []
+        for quota in api_instance.api_client.sanitize_for_serialization(response.items or []):
+            related = [r for r in quota.get('related_resources') or []
+                        if r.get('product') == 'ROSA' and r.get('resource_type') == 'cluster.aws']
+            if not related:
+                continue
+            # ROSA clusters are usually free (cost 0) against an allowance of 0,
+            # any one quota with room for the cost is enough.
+            cost = min(r.get('cost') or 0 for r in related)
+            allowed = quota.get('allowed')
+            consumed = quota.get('consumed') or 0
+            if cost == 0 or allowed is None or allowed - consumed >= cost:
+                return True, "quota {} is available".format(quota.get('quota_id'))
+            exhausted.append("{} ({} of {} used, needs {})".format(quota.get('quota_id'), consumed, allowed, cost))
+        if exhausted:
+            return False, "quota is used up: {}".format(", ".join(exhausted))
+        return True, "quota is available"
+
+    def checks():
+        """(name, check, the api methods the check needs) for every check."""
+        return [
+            ('region', OcmPreflightModule.check_region,
+                ['api_clusters_mgmt_v1_cloud_providers_cloud_provider_id_regions_region_id_get']),
+            ('version', OcmPreflightModule.check_version,
+                ['api_clusters_mgmt_v1_versions_version_id_get']),
+            ('flavour', OcmPreflightModule.check_flavour,
+                ['api_clusters_mgmt_v1_flavours_flavour_id_get']),
+            ('machine_type', OcmPreflightModule.check_machine_type,
+                ['api_clusters_mgmt_v1_aws_inquiries_machine_types_post']),
+            ('quota', OcmPreflightModule.check_quota,
+                ['api_accounts_mgmt_v1_current_account_get', 'api_accounts_mgmt_v1_organizations_org_id_quota_cost_get']),
+        ]
+
+    def run_check(api_instance, params, name, check, methods):
+        # older ocm_client builds don't have every endpoint
+        if not all(hasattr(api_instance, method) for method in methods):
+            return dict(check=name, ok=True, skipped=True, message="not supported by the installed ocm_client")
+        try:
+            ok, message = check(api_instance, params)
+        except ApiException as e:
+            ok, message = False, "OCM returned an error: {}".format(e.reason)
+        except Exception as e:
+            ok, message = False, "check failed: {}: {}".format(type(e).__name__, e)
+        return dict(check=name, ok=ok, skipped=False, message=message)
+
+    def run(api_instance, params):
+        """Run every check concurrently, returns (report, err).
+
+        err summarises all of the failed checks, or is None if they passed.
+        """
+        checks = OcmPreflightModule.checks()
+        with ThreadPoolExecutor(max_workers=len(checks)) as executor:
+            report = list(executor.map(
+                lambda check: OcmPreflightModule.run_check(api_instance, params, *check), checks))
+        failed = [item for item in report if not item['ok']]
+        if failed:
+            return report, "preflight checks failed:\n" + "\n".join(
+                "  {}: {}".format(item['check'], item['message']) for item in failed)
+        return report, None
+
 class OcmIdpModule(object):
     def get_cluster_idps(api_instance, cluster_id):
         try:
             api_request = api_instance.api_clusters_mgmt_v1_clusters_cluster_id_identity_providers_get(cluster_id,page=1,size=-1)
         except ApiException as e:
+            if e.status == 404:
+                OcmClusterModule.forget_cluster_id(api_instance, cluster_id)
             return None, "Exception when calling DefaultApi->api_clusters_mgmt_v1_clusters_cluster_id_identity_providers_get: %s\n" % e
             # module.fail_json("Exception when calling DefaultApi->api_clusters_mgmt_v1_clusters_cluster_id_identity_providers_get: %s\n" % e)
         return api_request.items, None
@@ -419,13 +1230,76 @@ class OcmIdpModule(object):
             kind = 'User',
             id = username
         )
+        create_role = None
         try:
             create_role = api_instance.api_clusters_mgmt_v1_clusters_cluster_id_groups_group_id_users_post(cluster_id, group_id, user=user)
         except ApiException as e:
-            if e.body.id not in ["400"]:
+            # 400 is OCM telling us the user is already in the group
+            if error_id(e) not in ["400"]:
                 return None, "Exception when calling DefaultApi->api_clusters_mgmt_v1_clusters_cluster_id_groups_group_id_users_post: {}\n".format(e)
         return create_role, None
 
+    def delete_cluster_role(api_instance, cluster_id, role, username):
+        try:
+            api_instance.api_clusters_mgmt_v1_clusters_cluster_id_groups_group_id_users_user_id_delete(cluster_id, role, username)
+        except ApiException as e:
+            if e.status != 404:
+                return None, "Exception when calling DefaultApi->api_clusters_mgmt_v1_clusters_cluster_id_groups_group_id_users_user_id_delete: {}\n".format(e)
+        return username, None
+
+    def get_group_members(api_instance, cluster_id):
+        """Every group of a cluster and its users, returns ({group: [users]}, err).
+
+        The groups come back with their users embedded, so this is a single
+        request unless there are more groups than fit on a page.
+        """
+        members = dict()
+        page = 1
+        while True:
+            try:
+                api_response = api_instance.api_clusters_mgmt_v1_clusters_cluster_id_groups_get(cluster_id, page=page, size=GROUP_PAGE_SIZE)
+            except ApiException as e:
+                if e.status == 404:
+                    OcmClusterModule.forget_cluster_id(api_instance, cluster_id)
+                return None, "Exception when calling DefaultApi->api_clusters_mgmt_v1_clusters_cluster_id_groups_get: {}\n".format(e)
+            items = api_response.items or []
+            for group in items:
+                users = (group.users.items if group.users else None) or []
+                members[group.id] = sorted(user.id for user in users)
+            if len(items) < GROUP_PAGE_SIZE or (api_response.total and page * GROUP_PAGE_SIZE >= api_response.total):
+                return members, None
+            page += 1
+
+    def sync_group_members(api_instance, cluster_id, desired, exclusive=False, concurrency=GROUP_SYNC_CONCURRENCY):
+        """Make the cluster groups in desired contain its users, returns (report, err).
+
+        Only the missing users are added. With exclusive, users that aren't
+        in the list are removed from that group too. The adds and removals
+        run concurrently on the one api_instance.
+        """
+        members, err = OcmIdpModule.get_group_members(api_instance, cluster_id)
+        if err:
+            return None, err
+        report = dict()
+        changes = []
+        for group, users in desired.items():
+            current = set(members.get(group, []))
+            wanted = set(users)
+            added = sorted(wanted - current)
+            removed = sorted(current - wanted) if exclusive else []
+            after = wanted if exclusive else wanted | current
+            report[group] = dict(added=added, removed=removed, members=sorted(after))
+            changes.extend((OcmIdpModule.create_cluster_role, group, user) for user in added)
+            changes.extend((OcmIdpModule.delete_cluster_role, group, user) for user in removed)
+        if not changes:
+            return report, None
+        with ThreadPoolExecutor(max_workers=max(1, min(concurrency, len(changes)))) as executor:
+            results = list(executor.map(lambda change: change[0](api_instance, cluster_id, change[1], change[2]), changes))
+        errors = [err for _, err in results if err]
+        if errors:
+            return report, "failed to update cluster groups:\n" + "\n".join(errors)
+        return report, None
+
 class OcmOidcConfig:
     def get(api_instance, oidc_config_id):
         try:
@@ -434,3 +1308,160 @@ class OcmOidcConfig:
             err = "Exception when calling DefaultApi->api_clusters_mgmt_v1_oidc_configs_oidc_config_id_get: {}".format(e)
             return None, err
         return api_response, None
+
+class OcmVersionModule(object):
+    def version_search(channel_group, hosted_cp):
+        search = "enabled = true AND channel_group = {}".format(search_quote(channel_group))
+        if hosted_cp:
+            search += " AND hosted_control_plane_enabled = true"
+        else:
+            search += " AND rosa_enabled = true"
+        return search
+
+    def list_versions(api_instance, channel_group, hosted_cp):
+        """Fetch every enabled version in a channel group, following all pages."""
+        search = OcmVersionModule.version_search(channel_group, hosted_cp)
+        versions = []
+        page = 1
+        try:
+            while True:
+                response = api_instance.api_clusters_mgmt_v1_versions_get(page=page, size=VERSION_PAGE_SIZE,
+                                order="default desc, id desc", search=search)
+                items = response.items or []
+                versions.extend(api_instance.api_client.sanitize_for_serialization(item) for item in items)
+                if len(items) < VERSION_PAGE_SIZE or (response.total and page * VERSION_PAGE_SIZE >= response.total):
+                    break
+                page += 1
+        except ApiException as e:
+            return None, "Exception when calling DefaultApi->api_clusters_mgmt_v1_versions_get: {}\n".format(e)
+        for version in versions:
+            version['version'] = version['raw_id']
+        return OcmVersionModule.sort_versions(versions), None
+
+    def get_versions(api_instance, channel_group, hosted_cp, cache_ttl=VERSION_CACHE_TTL):
+        """Like list_versions but served from a local catalog cache while it's fresh."""
+        if not cache_ttl:
+            return OcmVersionModule.list_versions(api_instance, channel_group, hosted_cp)
+        path = cache_file('ocm-versions', OCM_HOST, channel_group, bool(hosted_cp))
+        cached = read_cache(path)
+        if is_fresh(cached, cache_ttl):
+            return cached['versions'], None
+        with locked_cache(path) as cache:
+            # another fork may have refreshed it while we waited on the lock
+            if is_fresh(cache, cache_ttl):
+                return cache['versions'], None
+            versions, err = OcmVersionModule.list_versions(api_instance, channel_group, hosted_cp)
+            if err:
+                return None, err
+            cache['versions'] = versions
+            cache['cached_at'] = time.time()
+        return versions, None
+
+    def get_channel_versions(api_instance, channel_groups, hosted_cp, cache_ttl=VERSION_CACHE_TTL):
+        """Fetch several channel groups at once and merge them, returns (versions, err).
+
+        Each version appears once, with channel_groups listing every channel
+        it was found in. The lookups share the one authenticated client.
+        """
+        channel_groups = list(dict.fromkeys(channel_groups))
+        with ThreadPoolExecutor(max_workers=len(channel_groups) or 1) as executor:
+            results = list(executor.map(
+                lambda channel_group: OcmVersionModule.get_versions(api_instance, channel_group, hosted_cp, cache_ttl),
+                channel_groups))
+
+        merged = dict()
+        for channel_group, (versions, err) in zip(channel_groups, results):
+            if err:
+                return None, err
+            for version in versions:
+                if version['raw_id'] not in merged:
+                    merged[version['raw_id']] = dict(version, channel_groups=[])
+                merged[version['raw_id']]['channel_groups'].append(channel_group)
+        return OcmVersionModule.sort_versions(merged.values()), None
+
+    def get_upgrade_graph(api_instance, channel_groups, hosted_cp, cache_ttl=VERSION_CACHE_TTL):
+        """Build (or load) the version -> available upgrades graph, returns (graph, err).
+
+        Only versions present in the catalog become nodes, so every hop on a
+        path is a version OCM will actually let you pick.
+        """
+        channel_groups = sorted(set(channel_groups))
+        path = cache_file('ocm-upgrade-graph', OCM_HOST, ",".join(channel_groups), bool(hosted_cp))
+        if cache_ttl:
+            cached = read_cache(path)
+            if is_fresh(cached, cache_ttl):
+                return cached['graph'], None
+        versions, err = OcmVersionModule.get_channel_versions(api_instance, channel_groups, hosted_cp, cache_ttl)
+        if err:
+            return None, err
+        graph = dict()
+        for version in versions:
+            graph[version['raw_id']] = version.get('available_upgrades') or []
+        for raw_id in graph:
+            graph[raw_id] = sorted([v for v in graph[raw_id] if v in graph], key=version_key, reverse=True)
+        if cache_ttl:
+            with locked_cache(path) as cache:
+                cache['graph'] = graph
+                cache['cached_at'] = time.time()
+        return graph, None
+
+    def add_source_version(api_instance, graph, raw_id):
+        """Add a version that's no longer in the catalog as a starting point, returns err.
+
+        Clusters are often on an older z-stream that has since been disabled.
+        Its upgrades are fetched by id and kept only where they lead into the
+        catalog, so it can be upgraded from but never through. A version OCM
+        doesn't know at all is left out and so stays unreachable.
+        """
+        if raw_id in graph:
+            return None
+        try:
+            version = api_instance.api_clusters_mgmt_v1_versions_version_id_get("openshift-v{}".format(raw_id))
+        except ApiException as e:
+            if e.status == 404:
+                return None
+            return "Exception when calling DefaultApi->api_clusters_mgmt_v1_versions_version_id_get: {}\n".format(e)
+        graph[raw_id] = sorted([v for v in version.available_upgrades or [] if v in graph],
+                               key=version_key, reverse=True)
+        return None
+
+    def upgrade_paths_from(graph, source):
+        """Breadth first walk from source, returns the predecessor of every reachable version."""
+        previous = {source: None}
+        queue = deque([source])
+        while queue:
+            current = queue.popleft()
+            # try the biggest jumps first so ties go to the newer intermediate
+            for upgrade in graph.get(current, []):
+                if upgrade not in previous:
+                    previous[upgrade] = current
+                    queue.append(upgrade)
+        return previous
+
+    def shortest_upgrade_path(graph, source, target, previous=None):
+        """The fewest-hops list of versions from source to target, or None if there isn't one."""
+        if previous is None:
+            previous = OcmVersionModule.upgrade_paths_from(graph, source)
+        if target not in previous:
+            return None
+        path = [target]
+        while previous[path[-1]] is not None:
+            path.append(previous[path[-1]])
+        return list(reversed(path))
+
+    def sort_versions(versions):
+        """Newest first, by semver rather than by id string."""
+        return sorted(versions, key=lambda v: version_key(v['raw_id']), reverse=True)
+
+    def match_versions(versions, version):
+        return [v for v in versions if version_matches(v['raw_id'], version)]
+
+    def latest_version(versions, version=None):
+        """The newest version matching a prefix, e.g. the latest patch of 4.14."""
+        matches = OcmVersionModule.match_versions(versions, version)
+        if not matches:
+            return None
+        return matches[0]
+
+    def is_available(versions, version):
+        return any(v['raw_id'] == version for v in versions)
@@ -0,0 +1,79 @@
+#!/usr/bin/env python
+
+# Copyright 2023 Paul Czarkowski <pczarkow@redhat.com>
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+
+#     http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from __future__ import (absolute_import, division, print_function)
+
+__metaclass__ = type
+
+import time
+import threading
+
+# api.openshift.com rate limits per user, and a burst of creates or searches
+# from one process is the quickest way to find out where that limit is. A
+# token bucket lets short bursts through and then settles to a steady rate.
+DEFAULT_RATE = 5.0
+DEFAULT_BURST = 10
+
+
+class TokenBucket(object):
+    """Thread safe token bucket, rate tokens per second up to burst at once.
+
+    acquire() blocks until a token is available and returns how long it
+    waited. A rate of 0 (or less) never blocks.
+    """
+
+    def __init__(self, rate=DEFAULT_RATE, burst=DEFAULT_BURST, sleep=time.sleep, clock=time.monotonic):
+        self.rate = float(rate)
+        self.burst = max(1, int(burst))
+        self.sleep = sleep
+        self.clock = clock
+        self.tokens = float(self.burst)
+        self.updated = clock()
+        self.lock = threading.Lock()
+        self.acquired = 0
+        self.throttled = 0
+        self.waited = 0.0
+
+    def refill(self, now):
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def acquire(self):
+        if self.rate <= 0:
+            with self.lock:
+                self.acquired += 1
+            return 0.0
+        waited = 0.0
+        while True:
+            with self.lock:
+                self.refill(self.clock())
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    self.acquired += 1
+                    if waited:
+                        self.throttled += 1
+                        self.waited += waited
+                    return waited
+                delay = (1 - self.tokens) / self.rate
+            self.sleep(delay)
+            waited += delay
+
+    def summary(self):
+        return dict(
+            acquired=self.acquired,
+            throttled=self.throttled,
+            waited=round(self.waited, 3),
+        )
@@ -0,0 +1,104 @@
+#!/usr/bin/env python
+
+# Copyright 2023 Paul Czarkowski <pczarkow@redhat.com>
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+
+#     http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from __future__ import (absolute_import, division, print_function)
+
+__metaclass__ = type
+
+import os
+import time
+import subprocess
+
+from .cache import cache_file, cache_key, locked_cache, read_cache
+
+# `rosa version` is a go binary starting up (and sometimes phoning home to
+# check for a newer release) just to print a string that only changes when the
+# binary does. Remember the answer against the binary's path, size and mtime.
+
+# only this much of the end of a log file is read back to build its tail.
+LOG_TAIL_BYTES = 65536
+
+
+def rosa_version(module, rosa):
+    """The version of the rosa binary at rosa, returns (version, err)."""
+    try:
+        path = os.path.realpath(rosa)
+        stat = os.stat(path)
+    except OSError as e:
+        return None, "could not stat {}: {}".format(rosa, e)
+    key = cache_key(path, stat.st_size, stat.st_mtime_ns)
+    cache_path = cache_file('rosa-version')
+    entry = read_cache(cache_path).get(key)
+    if entry and entry.get('version'):
+        return entry['version'], None
+
+    rc, stdout, stderr = module.run_command([rosa, "version"])
+    if rc != 0:
+        return None, "could not run rosa version\n{}".format(stderr)
+    # anything after the first line is a "there's a newer release" nag
+    version = stdout.rstrip().split('\n')[0].strip()
+    with locked_cache(cache_path) as cache:
+        cache[key] = dict(path=path, version=version, cached_at=time.time())
+    return version, None
+
+
+def rosa_bin(module, min_version, result):
+    """Find the rosa cli and check it is at least min_version, failing the module if not."""
+    from packaging import version as check_version
+
+    rosa = module.get_bin_path("rosa", required=True)
+    if rosa == None:
+        module.fail_json(msg='rosa cli not found in $PATH', **result)
+    rosa_version_str, err = rosa_version(module, rosa)
+    if err:
+        module.fail_json(msg=err, **result)
+    try:
+        too_old = check_version.parse(rosa_version_str) < check_version.parse(min_version)
+    except check_version.InvalidVersion:
+        module.fail_json(msg="could not parse rosa version %s" % (rosa_version_str), **result)
+    if too_old:
+        module.fail_json(msg="rosa version %s does not meet minimum of %s" % (rosa_version_str, min_version), **result)
+    return rosa
+
+
+def tail_file(path, lines):
+    """The last lines of a (possibly huge) file without reading all of it."""
+    if lines <= 0:
+        return ''
+    with open(path, 'rb') as f:
+        f.seek(0, os.SEEK_END)
+        f.seek(max(0, f.tell() - LOG_TAIL_BYTES))
+        data = f.read().decode('utf-8', 'replace')
+    return '\n'.join(data.splitlines()[-lines:])
+
+
+def run_logged(args, log_dir, prefix, tail=20, cwd=None):
+    """Run args with stdout and stderr streamed to files in log_dir, returns (rc, output).
+
+    Nothing is buffered in memory, output only carries the paths, byte
+    counts and the last tail lines of each stream.
+    """
+    os.makedirs(log_dir, mode=0o700, exist_ok=True)
+    base = os.path.join(log_dir, "{}-{}-{}".format(prefix, time.strftime('%Y%m%dT%H%M%S'), os.getpid()))
+    paths = dict(stdout=base + '.stdout.log', stderr=base + '.stderr.log')
+    with open(paths['stdout'], 'wb') as stdout, open(paths['stderr'], 'wb') as stderr:
+        rc = subprocess.call(args, stdin=subprocess.DEVNULL, stdout=stdout, stderr=stderr, cwd=cwd)
+    output = dict()
+    for stream, path in paths.items():
+        output[stream + '_path'] = path
+        output[stream + '_bytes'] = os.path.getsize(path)
+        output[stream + '_tail'] = tail_file(path, tail)
+    return rc, output
@@ -0,0 +1,96 @@
+#!/usr/bin/env python
+
+# Copyright 2023 Paul Czarkowski <pczarkow@redhat.com>
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+
+#     http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from __future__ import (absolute_import, division, print_function)
+
+__metaclass__ = type
+
+import time
+from datetime import datetime
+
+# Cluster operations have a predictable shape: a few quick state changes right
+# after the request, a long quiet stretch while the installer does its thing,
+# then the finish somewhere around the usual duration. Poll fast at both ends
+# and back off in the middle.
+WAIT_EARLY_PHASE = 180
+WAIT_FAST_INTERVAL = 10
+WAIT_NEAR_INTERVAL = 15
+WAIT_SLOW_INTERVAL = 60
+WAIT_NEAR_FRACTION = 0.8
+
+# roughly how long things usually take, the waiter polls faster as it gets
+# close to these.
+EXPECTED_INSTALL_SECONDS = 2400
+EXPECTED_HCP_INSTALL_SECONDS = 900
+EXPECTED_UNINSTALL_SECONDS = 900
+
+
+def adaptive_interval(elapsed, expected):
+    if elapsed < WAIT_EARLY_PHASE:
+        return WAIT_FAST_INTERVAL
+    if expected and elapsed >= expected * WAIT_NEAR_FRACTION:
+        return WAIT_NEAR_INTERVAL
+    return WAIT_SLOW_INTERVAL
+
+
+class Waiter(object):
+    """Poll until a state is reached, recording when each state was first seen.
+
+    poll is a callable returning (state, value). done is a callable taking
+    the state and returning True once waiting can stop.
+    """
+
+    def __init__(self, timeout, expected=None, sleep=time.sleep, clock=time.time):
+        self.timeout = timeout
+        self.expected = expected
+        self.sleep = sleep
+        self.clock = clock
+        self.polls = 0
+        self.elapsed = 0
+        self.timed_out = False
+        self.transitions = []
+
+    def record(self, state):
+        if self.transitions and self.transitions[-1]['state'] == state:
+            return
+        self.transitions.append(dict(
+            state=state,
+            seen_at=datetime.utcnow().strftime('%Y-%m-%dT%H:%M:%SZ'),
+            elapsed=int(self.elapsed),
+        ))
+
+    def wait(self, poll, done):
+        start = self.clock()
+        while True:
+            state, value = poll()
+            self.polls += 1
+            self.elapsed = self.clock() - start
+            self.record(state)
+            if done(state):
+                return state, value
+            remaining = self.timeout - self.elapsed
+            if remaining <= 0:
+                self.timed_out = True
+                return state, value
+            self.sleep(min(adaptive_interval(self.elapsed, self.expected), remaining))
+
+    def summary(self):
+        return dict(
+            elapsed=int(self.elapsed),
+            polls=self.polls,
+            timed_out=self.timed_out,
+            transitions=self.transitions,
+        )
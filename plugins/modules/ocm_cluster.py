@@ -112,9 +112,19 @@ options:
         required: false
         type: str
     wait:
-        description: wait for up to an hour until operation is complete
+        description: wait until the cluster reaches one of C(wait_states) before returning. Polls in-process on a single OCM session, quickly at first and near the usual completion time and less often in between.
         required: false
         type: bool
+    wait_states:
+        description: cluster states to wait for, for example C(installing) or C(ready). C(absent) waits for the cluster to be deleted. Defaults to C(ready) for C(state=present) and C(absent) for C(state=absent). Waiting always stops if the cluster goes into C(error).
+        required: false
+        type: list
+        elements: str
+    wait_timeout:
+        description: how many seconds to wait before giving up.
+        required: false
+        default: 3600
+        type: int
     kms_key_arn:
         description: kms key (BYOK)
         required: false
@@ -123,8 +133,47 @@ options:
         description: the action to take
         required: false
         type: str
-        choices: ['present','absent', 'dry-run', 'describe']
+        choices: ['present','absent', 'dry-run', 'preflight']
         default: present
+    reconcile:
+        description: when the cluster already exists, compare the proxy, trust bundle and compute node options that are set with the live cluster and PATCH only the fields that differ. The hash of the last applied spec is kept locally and nothing is compared or sent while it still matches. OCM never returns the trust bundle, so it is only sent when it changed since the last spec applied from this controller, or with C(force_reconcile).
+        required: false
+        default: true
+        type: bool
+    force_reconcile:
+        description: compare with the live cluster even if the spec hash hasn't changed, to undo changes made outside of ansible. This also sends the trust bundle.
+        required: false
+        default: false
+        type: bool
+    plan_online:
+        description: with C(state=dry-run), allow looking up the availability zones of C(subnet_ids), the creator ARN and the oidc config. By default a dry-run makes no OCM or AWS calls at all and renders the payload purely from the module options.
+        required: false
+        default: false
+        type: bool
+    availability_zones:
+        description: availability zones of the compute nodes, only used by an offline C(state=dry-run) in place of looking them up from C(subnet_ids).
+        required: false
+        type: list
+        elements: str
+    creator_arn:
+        description: ARN recorded as the cluster creator, only used by an offline C(state=dry-run) in place of the caller's AWS identity.
+        required: false
+        type: str
+    preflight:
+        description: before creating a cluster, check that the region, version, flavour, compute machine type and quota are all available. The checks run concurrently and every failure is reported at once. Use C(state=preflight) to only run the checks.
+        required: false
+        default: true
+        type: bool
+    fields:
+        description: Only return these fields of the cluster, as dotted paths, for example C(api.url) or C(aws.sts.oidc_endpoint_url).
+        required: false
+        type: list
+        elements: str
+    summary:
+        description: Only return a compact summary of the cluster (id, name, state, urls, region, version and the sts details the roles need). Combined with C(fields) when both are given.
+        required: false
+        default: false
+        type: bool
 
 author:
     - Paul Czarkowski (@paulczar)
@@ -136,17 +185,45 @@ EXAMPLES = r'''
     name: my-rosa-cluster
     state: present
 
-- name: delete a rosa cluster
+- name: check a cluster spec without creating it
+  ocm_cluster:
+    name: my-rosa-cluster
+    region: us-east-2
+    version: "4.14.17"
+    compute_machine_type: m5.xlarge
+    role_arn: arn:aws:iam::123456789012:role/ManagedOpenShift-Installer-Role
+    state: preflight
+
+- name: render the create payload without calling OCM or AWS
+  ocm_cluster:
+    name: my-rosa-cluster
+    region: us-east-2
+    version: "4.14.17"
+    sts: true
+    aws_account_id: "123456789012"
+    subnet_ids: subnet-0123456789abcdef0,subnet-0fedcba9876543210
+    availability_zones:
+      - us-east-2a
+    operator_roles_prefix: my-rosa-cluster-abcd
+    state: dry-run
+  register: _plan
+
+- name: delete a rosa cluster and wait for it to be gone
   ocm_cluster:
     name: my-rosa-cluster
     state: absent
+    wait: true
+    wait_timeout: 1800
 '''
 
 RETURN = r'''
 stdout: str
 stderr: str
 password: str
+reconcile: dict with the spec_hash, the diff of each changed field, and whether the cluster was patched or the reconcile skipped
+payload: dict of the JSON body that would be sent to create the cluster, with C(state=dry-run)
 # These are examples of possible return values, and in general should use other names for return values.
+api_stats: dict with the number of OCM requests, retries and 429s, and the seconds spent rate limited or backing off
 '''
 
 MIN_ROSA_VERSION = "1.2.23"
@@ -156,54 +233,20 @@ from packaging import version as check_version
 from semver import parse as semver_parse
 from ..module_utils.ocm import OcmModule
 from ..module_utils.ocm import OcmClusterModule
+from ..module_utils.ocm import OcmPreflightModule
+from ..module_utils.ocm import cluster_argument_spec, cluster_fields, project_fields
+from ..module_utils.waiter import EXPECTED_HCP_INSTALL_SECONDS
 from ocm_client.rest import ApiException
 import ocm_client
 import time
 import json
 import string
 import random
+import hashlib
 
 def run_module():
     # define available arguments/parameters a user can pass to the module
-    module_args = dict(
-        name=dict(type='str', required=True),
-        region=dict(type='str', required=False),
-        version=dict(type='str', required=False, default="4.8.2"),
-        channel_group=dict(type='str', required=False),
-        compute_machine_type=dict(type='str', required=False),
-        compute_nodes=dict(type='str', required=False),
-        min_replicas=dict(type='str', required=False),
-        max_replicas=dict(type='str', required=False),
-        machine_cidr=dict(type='str', required=False),
-        service_cidr=dict(type='str', required=False),
-        pod_cidr=dict(type='str', required=False),
-        host_prefix=dict(type='int', required=False),
-        http_proxy=dict(type='str', required=False),
-        https_proxy=dict(type='str', required=False),
-        no_proxy=dict(type='str', required=False),
-        additional_trust_bundle_file=dict(type='str', required=False),
-        subnet_ids=dict(type='str', required=False),
-        multi_az=dict(type='bool', required=False),
-        private=dict(type='bool', required=False),
-        private_link=dict(type='bool', required=False),
-        sts=dict(type='bool', required=False),
-        aws_account_id=dict(type='str', required=False),
-        disable_scp_checks=dict(type='bool', required=False),
-        disable_workload_monitoring=dict(type='bool', required=False, default=False),
-        wait=dict(type='bool', required=False),
-        state=dict(type='str', default='present', choices=['present','absent','dry-run']),
-        role_arn=dict(type='str', required=False),
-        support_role_arn=dict(type='str', required=False),
-        operator_roles_prefix=dict(type='str', required=False),
-        controlplane_iam_role=dict(type='str', required=False),
-        worker_iam_role=dict(type='str', required=False),
-        hosted_cp=dict(type=bool, required=False, default=False),
-        oidc_config_id=dict(type=str, required=False),
-        kms_key_arn=dict(type='str', required=False),
-        admin_username=dict(type='str', required=False, default='admin'),
-        admin_password=dict(type='str', required=False),
-        tags=dict(type='dict', required=False)
-    )
+    module_args = cluster_argument_spec()
 
     # seed the result dict in the object
     # we primarily care about changed and state
@@ -236,31 +279,62 @@ def run_module():
 
     if module.params['state'] != 'absent':
         if not module.params['operator_roles_prefix']:
-            prefix = ''.join(random.choices(string.ascii_lowercase +
-                                string.digits, k=4))
+            if module.params['state'] == 'dry-run':
+                # keep rendered payloads stable from one run to the next
+                prefix = hashlib.sha256(module.params['name'].encode('utf-8')).hexdigest()[:4]
+            else:
+                prefix = ''.join(random.choices(string.ascii_lowercase +
+                                    string.digits, k=4))
             module.params['operator_roles_prefix'] = "{}-{}".format(module.params['name'], prefix)
 
-    with ocm_client.ApiClient(OcmModule.ocm_authenticate()) as api_client:
+    if module.params['admin_password'] and module.params['hosted_cp']:
+        module.fail_json("admin_password is not supported for hosted control-plane clusters")
+
+    # render the create payload. unless told otherwise this happens before
+    # authenticating so it needs no credentials and makes no network calls.
+    if module.params['state'] == "dry-run" and not module.params['plan_online']:
+        plan_cluster(module, None, result)
+
+    with OcmModule.api_client() as api_client:
+        result['api_stats'] = api_client.stats
         api_instance = ocm_client.DefaultApi(api_client)
 
-        if module.params['admin_password'] and module.params['hosted_cp']:
-            module.fail_json("admin_password is not supported for hosted control-plane clusters")
+        if module.params['state'] == "dry-run":
+            plan_cluster(module, api_instance, result)
 
 
-        # Check to see if there is a cluster of the same name
+        if module.params['state'] == "preflight":
+            result['preflight'], err = OcmPreflightModule.run(api_instance, module.params)
+            if err:
+                module.fail_json(err, **result)
+            module.exit_json(**result)
+
+        # Check to see if there is a cluster of the same name. don't trust a
+        # cached "not found" when we're about to create one.
         if not cluster_id:
-            cluster_id, err = OcmClusterModule.get_cluster_id(api_instance, name)
+            cluster_id, cluster_info, err = OcmClusterModule.lookup_cluster(api_instance, name,
+                                                use_negative=(module.params['state'] != "present"))
             if err:
                 module.fail_json(err)
         if cluster_id:
-            cluster_info, err = OcmClusterModule.get_cluster_info(api_instance, cluster_id)
-            if err:
-                module.fail_json(err)
             if module.params['state'] == "present":
-                result['cluster'] = cluster_info
+                result['cluster'] = project_fields(cluster_info, cluster_fields(module.params))
+                if module.params['wait']:
+                    cluster_info = wait_for_cluster(module, api_instance, cluster_id, result)
+                if module.params['reconcile']:
+                    cluster_info, result['reconcile'], err = OcmClusterModule.reconcile_cluster(api_instance,
+                                                                 cluster_id, cluster_info, module.params,
+                                                                 module.params['force_reconcile'])
+                    if err:
+                        module.fail_json(err, **result)
+                    result['changed'] = result['reconcile']['patched']
+                    result['cluster'] = project_fields(cluster_info, cluster_fields(module.params))
                 module.exit_json(**result)
 
         if module.params['state'] == "absent":
+            # nothing to delete
+            if not cluster_id:
+                module.exit_json(**result)
             deprovision = True
             dry_run = False
             try:
@@ -269,51 +343,64 @@ def run_module():
                 err = "Exception when calling DefaultApi->api_clusters_mgmt_v1_clusters_cluster_id_delete: {}\n".format(e)
                 module.fail_json(err)
             result['changed'] = True
+            if module.params['wait']:
+                wait_for_cluster(module, api_instance, cluster_id, result)
+                module.exit_json(**result)
             cluster_info, err = OcmClusterModule.get_cluster_info(api_instance, cluster_id)
             if err:
                 result['cluster'] = {}
             else:
-                result['cluster'] = cluster_info
+                result['cluster'] = project_fields(cluster_info, cluster_fields(module.params))
             module.exit_json(**result)
 
             # todo we should fetch the cluster status and return it vs just returning empty dict
             module.exit_json(**result)
 
         if module.params['state'] == "present":
-            # check region is available
-            # https://api.openshift.com/api/clusters_mgmt/v1/cloud_providers/aws/regions
-            # check version is available
-            # https://api.openshift.com/api/clusters_mgmt/v1/versions?page=1&search=enabled+%3D+%27true%27+AND+rosa_enabled+%3D+%27true%27+AND+channel_group+%3D+%27stable%27&size=100
-            # get list of flavors
-            # https://api.openshift.com/api/clusters_mgmt/v1/flavours/osd-4
-                # "kind": "Flavour",
-                # "name": "OpenShift Dedicated 4.X",
-                # "id": "osd-4",
-            # check machine types (POST)
-            # https://api.openshift.com/api/clusters_mgmt/v1/aws_inquiries/machine_types?order=category+asc&page=1&size=100
-                #   "aws": {
-                #     "sts": {
-                #       "role_arn": "arn:aws:iam::660250927410:role/ManagedOpenShift-Installer-Role"
-                #     }
-                #   },
-                #   "region": {
-                #     "kind": "CloudRegion",
-                #     "id": "us-east-2"
-                #   }
-                # }
-            # check quotas
-            # https://api.openshift.com/api/accounts_mgmt/v1/organizations/1rkxPO7W12geIcRWITwI0I8VIQV/quota_cost?fetchRelatedResources=true&page=1&search=quota_id~%3D%27gpu%27&size=-1'
+            # catch a bad spec now rather than minutes into the install
+            if module.params['preflight']:
+                result['preflight'], err = OcmPreflightModule.run(api_instance, module.params)
+                if err:
+                    module.fail_json(err, **result)
 
             cluster_info, err = OcmClusterModule.create_cluster(api_instance, module.params)
-            result['cluster'] = cluster_info
+            result['cluster'] = project_fields(cluster_info, cluster_fields(module.params))
             if err:
                 module.fail_json("cluster:\n{}\n{}".format(cluster_info,err),**result)
             result['changed'] = True
+            if module.params['wait']:
+                wait_for_cluster(module, api_instance, cluster_info['id'], result)
             module.exit_json(**result)
 
-        elif module.params['state'] == "dry-run":
-            # result['details'] = '{"output": "successful dry-run"}'
-            module.exit_json(**result)
+def plan_cluster(module, api_instance, result):
+    cluster, err = OcmClusterModule.build_cluster(api_instance, module.params, offline=api_instance is None)
+    if err:
+        module.fail_json(err, **result)
+    result['cluster'] = cluster.to_dict()
+    # the JSON body as the api client would send it, without the unset fields
+    result['payload'] = ocm_client.ApiClient().sanitize_for_serialization(cluster)
+    module.exit_json(**result)
+
+def wait_for_cluster(module, api_instance, cluster_id, result):
+    states = module.params['wait_states']
+    if not states:
+        states = ['absent'] if module.params['state'] == 'absent' else ['ready']
+    expected = None
+    if module.params['hosted_cp'] and 'absent' not in states:
+        expected = EXPECTED_HCP_INSTALL_SECONDS
+    cluster_info, waiter, err = OcmClusterModule.wait_for_cluster(api_instance, cluster_id,
+                                    states, module.params['wait_timeout'], expected)
+    result['wait'] = waiter.summary()
+    if err:
+        module.fail_json(err, **result)
+    result['cluster'] = project_fields(cluster_info, cluster_fields(module.params))
+    if waiter.timed_out:
+        module.fail_json(msg="timed out after {}s waiting for cluster to be {}".format(
+            module.params['wait_timeout'], " or ".join(states)), **result)
+    state = cluster_info.get('state') if cluster_info else 'absent'
+    if state not in states:
+        module.fail_json(msg="cluster is {} instead of {}".format(state, " or ".join(states)), **result)
+    return cluster_info
 
 def main():
     run_module()
@@ -0,0 +1,210 @@
+#!/usr/bin/python
+
+# Copyright: (c) 2021, Paul Czarkowski <pczarkowski@redhat.com>
+# GNU General Public License v3.0+ (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+from __future__ import (absolute_import, division, print_function)
+__metaclass__ = type
+
+
+DOCUMENTATION = r'''
+---
+module: ocm_cluster_batch
+
+short_description: Creates many ROSA Clusters at once
+
+version_added: "1.0.0"
+
+description:
+  - Creates a list of ROSA (RedHat Openshift on AWS) Clusters from one task.
+  - Every cluster is created over the same authenticated OCM session, a few at a time, with the API calls spread out by a token bucket so a large batch doesn't trip OCM's rate limits.
+  - Clusters that already exist are left alone. One cluster failing doesn't stop the rest, the task fails at the end with every result and a summary.
+  - This only submits the creates, use ocm_cluster_wait to wait for the clusters to be ready.
+
+options:
+    clusters:
+        description: The clusters to create. Each item takes the same options as ocm_cluster, C(name) is required.
+        required: true
+        type: list
+        elements: dict
+    defaults:
+        description: Options applied to every cluster unless the item sets them itself.
+        required: false
+        type: dict
+    concurrency:
+        description: how many clusters are worked on at the same time.
+        required: false
+        default: 5
+        type: int
+    rate:
+        description: the steady number of OCM requests per second across the whole batch. 0 disables rate limiting.
+        required: false
+        default: 2.0
+        type: float
+    burst:
+        description: how many OCM requests can go out back to back before C(rate) kicks in.
+        required: false
+        default: 5
+        type: int
+
+author:
+    - Paul Czarkowski (@paulczar)
+'''
+
+EXAMPLES = r'''
+- name: create a cluster per student
+  ocm_cluster_batch:
+    concurrency: 10
+    defaults:
+      region: us-east-2
+      version: "4.14.17"
+      sts: true
+      hosted_cp: true
+      aws_account_id: "{{ aws_account_id }}"
+      oidc_config_id: "{{ oidc_config_id }}"
+      role_arn: "{{ installer_role_arn }}"
+      support_role_arn: "{{ support_role_arn }}"
+      worker_iam_role: "{{ worker_role_arn }}"
+    clusters: "{{ students | map('community.general.dict_kv', 'name') | list }}"
+  register: _batch
+'''
+
+RETURN = r'''
+clusters: list of dicts with the name, status (created, exists or failed), cluster and error of each cluster, in the order given
+summary: dict with the total and the number of clusters created, already existing and failed
+api_stats: dict with the number of OCM requests, retries and 429s, and the seconds spent rate limited or backing off
+rate_limit: dict with how many requests went through the token bucket, how many had to wait and the total seconds spent waiting
+'''
+
+from ansible.module_utils.basic import AnsibleModule
+from ansible.module_utils.common.arg_spec import ArgumentSpecValidator
+from concurrent.futures import ThreadPoolExecutor
+from ..module_utils.ocm import OcmModule
+from ..module_utils.ocm import OcmClusterModule
+from ..module_utils.ocm import OcmPreflightModule
+from ..module_utils.ocm import CLUSTER_SUMMARY_FIELDS
+from ..module_utils.ocm import cluster_argument_spec, cluster_fields, project_fields
+from ..module_utils.ratelimit import TokenBucket
+import ocm_client
+import string
+import random
+
+
+def run_module():
+    # define available arguments/parameters a user can pass to the module
+    module_args = dict(
+        clusters=dict(type='list', elements='dict', required=True),
+        defaults=dict(type='dict', required=False),
+        concurrency=dict(type='int', required=False, default=5),
+        rate=dict(type='float', required=False, default=2.0),
+        burst=dict(type='int', required=False, default=5),
+    )
+
+    result = dict(
+        changed=False,
+        clusters=[],
+        summary=dict(total=0, created=0, exists=0, failed=0),
+    )
+
+    module = AnsibleModule(
+        argument_spec=module_args,
+        supports_check_mode=True
+    )
+
+    # check every spec before creating anything
+    batch = []
+    errors = []
+    for item in module.params['clusters']:
+        params, err = cluster_params(module, item)
+        if err:
+            errors.append("{}: {}".format(item.get('name'), err))
+        batch.append(params)
+    names = [params['name'] for params in batch if params]
+    for name in sorted(set(name for name in names if names.count(name) > 1)):
+        errors.append("{}: appears more than once".format(name))
+    if errors:
+        module.fail_json(msg="invalid cluster specs:\n" + "\n".join("  " + e for e in errors), **result)
+    result['summary']['total'] = len(batch)
+
+    if module.check_mode:
+        module.exit_json(**result)
+
+    bucket = TokenBucket(module.params['rate'], module.params['burst'])
+    # every request in the batch draws from the one bucket
+    with OcmModule.api_client(limiter=bucket) as api_client:
+        result['api_stats'] = api_client.stats
+        api_instance = ocm_client.DefaultApi(api_client)
+        with ThreadPoolExecutor(max_workers=max(1, module.params['concurrency'])) as executor:
+            result['clusters'] = list(executor.map(
+                lambda params: create_cluster(api_instance, params), batch))
+
+    for item in result['clusters']:
+        result['summary'][item['status']] += 1
+    result['changed'] = result['summary']['created'] > 0
+    result['rate_limit'] = bucket.summary()
+    if result['summary']['failed']:
+        module.fail_json(msg="{} of {} clusters failed".format(
+            result['summary']['failed'], result['summary']['total']), **result)
+    module.exit_json(**result)
+
+def cluster_params(module, item):
+    """Validate one item against ocm_cluster's options, returns (params, err)."""
+    params = dict(module.params['defaults'] or {})
+    params.update(item)
+    validated = ArgumentSpecValidator(cluster_argument_spec()).validate(params)
+    if validated.error_messages:
+        return None, "; ".join(validated.error_messages)
+    params = validated.validated_parameters
+    if params['state'] != 'present':
+        return None, "only state=present is supported in a batch"
+    if params['admin_password'] and params['hosted_cp']:
+        return None, "admin_password is not supported for hosted control-plane clusters"
+    if params['admin_password']:
+        # options nested in a list aren't covered by no_log
+        module.no_log_values.add(params['admin_password'])
+    if not params['operator_roles_prefix']:
+        prefix = ''.join(random.choices(string.ascii_lowercase +
+                            string.digits, k=4))
+        params['operator_roles_prefix'] = "{}-{}".format(params['name'], prefix)
+    return params, None
+
+def create_cluster(api_instance, params):
+    # one bad cluster (a missing trust bundle file, an aws error) shouldn't
+    # take the rest of the batch down with it.
+    try:
+        return submit_cluster(api_instance, params)
+    except Exception as e:
+        return dict(name=params['name'], status='failed', cluster={}, error=str(e))
+
+def submit_cluster(api_instance, params):
+    item = dict(name=params['name'], status='failed', cluster={}, error=None)
+    fields = cluster_fields(params) or CLUSTER_SUMMARY_FIELDS
+
+    cluster_id, cluster_info, err = OcmClusterModule.lookup_cluster(api_instance, params['name'], use_negative=False)
+    if err:
+        item['error'] = str(err)
+        return item
+    if cluster_id:
+        item['status'] = 'exists'
+        item['cluster'] = project_fields(cluster_info, fields)
+        return item
+
+    if params['preflight']:
+        item['preflight'], err = OcmPreflightModule.run(api_instance, params)
+        if err:
+            item['error'] = str(err)
+            return item
+
+    cluster_info, err = OcmClusterModule.create_cluster(api_instance, params)
+    if err:
+        item['error'] = str(err)
+        return item
+    item['status'] = 'created'
+    item['cluster'] = project_fields(cluster_info, fields)
+    return item
+
+def main():
+    run_module()
+
+if __name__ == '__main__':
+    main()
@@ -21,8 +21,32 @@ description: Fetches information about an OCM (ROSA or OSD) Cluster
 options:
     name:
         description: Name of the cluster. This will be used when generating a sub-domain for your cluster on openshiftapps.com.
-        required: true
+        required: false
         type: str
+    names:
+        description: List of cluster names to fetch in as few paginated requests as possible. Results are returned in C(clusters), keyed by name.
+        required: false
+        type: list
+        elements: str
+    search:
+        description: OCM search expression, for example "region.id = 'us-east-2' AND state = 'ready'". Combined with C(names) when both are given.
+        required: false
+        type: str
+    fields:
+        description: Only return these fields of the cluster, as dotted paths, for example C(api.url) or C(aws.sts.oidc_endpoint_url).
+        required: false
+        type: list
+        elements: str
+    status_only:
+        description: Only fetch the cluster's status document (state, description, dns_ready, provision errors) and return it in C(status). Much cheaper than the full cluster when polling.
+        required: false
+        default: false
+        type: bool
+    summary:
+        description: Only return a compact summary of the cluster (id, name, state, urls, region, version and the sts details the roles need). Combined with C(fields) when both are given.
+        required: false
+        default: false
+        type: bool
 
 author:
     - Paul Czarkowski (@paulczar)
@@ -32,18 +56,42 @@ EXAMPLES = r'''
 - name: get info about ocm cluster
   ocm_cluster_info:
     name: my-rosa-cluster
+
+- name: get info about a batch of clusters
+  ocm_cluster_info:
+    names:
+      - my-rosa-cluster
+      - my-other-rosa-cluster
+
+- name: poll just the state of a cluster
+  ocm_cluster_info:
+    name: my-rosa-cluster
+    fields:
+      - id
+      - state
+
+- name: poll the cluster status document
+  ocm_cluster_info:
+    name: my-rosa-cluster
+    status_only: true
+
+- name: get info about every ready cluster in us-east-2
+  ocm_cluster_info:
+    search: "region.id = 'us-east-2' AND state = 'ready'"
 '''
 
 RETURN = r'''
-stdout: str
-stderr: str
-password: str
+cluster: dict of the cluster when looked up by name, empty if it doesn't exist
+clusters: dict of cluster name to cluster when using names or search
+status: dict of the cluster status when using status_only, empty if it doesn't exist
 # These are examples of possible return values, and in general should use other names for return values.
+api_stats: dict with the number of OCM requests, retries and 429s, and the seconds spent rate limited or backing off
 '''
 
 from ansible.module_utils.basic import *
 from ..module_utils.ocm import OcmModule
 from ..module_utils.ocm import OcmClusterModule
+from ..module_utils.ocm import cluster_fields, project_fields
 import ocm_client
 from ocm_client.rest import ApiException
 import time
@@ -53,7 +101,12 @@ import json
 def run_module():
     # define available arguments/parameters a user can pass to the module
     module_args = dict(
-        name=dict(type='str', required=True),
+        name=dict(type='str', required=False),
+        names=dict(type='list', elements='str', required=False),
+        search=dict(type='str', required=False),
+        fields=dict(type='list', elements='str', required=False),
+        summary=dict(type='bool', required=False, default=False),
+        status_only=dict(type='bool', required=False, default=False),
     )
 
     # seed the result dict in the object
@@ -63,6 +116,8 @@ def run_module():
     # for consumption, for example, in a subsequent task
     result = dict(
         cluster={},
+        clusters={},
+        status={},
     )
 
 
@@ -73,6 +128,8 @@ def run_module():
     # supports check mode
     module = AnsibleModule(
         argument_spec=module_args,
+        required_one_of=[('name', 'names', 'search')],
+        mutually_exclusive=[('name', 'names'), ('name', 'search')],
         supports_check_mode=True
     )
 
@@ -83,23 +140,39 @@ def run_module():
         module.exit_json(**result)
 
     name = module.params['name']
-    cluster_id = ""
 
-    with ocm_client.ApiClient(OcmModule.ocm_authenticate()) as api_client:
+    with OcmModule.api_client() as api_client:
+        result['api_stats'] = api_client.stats
         api_instance = ocm_client.DefaultApi(api_client)
 
-        if not cluster_id:
-            cluster_id, err = OcmClusterModule.get_cluster_id(api_instance, name)
+        # batch mode, one paginated list call per chunk of names
+        if not name:
+            clusters, err = OcmClusterModule.search_clusters(api_instance,
+                                names=module.params['names'], search=module.params['search'])
             if err:
                 module.fail_json(err)
-            if not cluster_id:
-                module.exit_json(**result)
-                module.fail_json("Unable to determin cluster_id from cluster_name: {}".format(name))
+            fields = cluster_fields(module.params)
+            result['clusters'] = dict((key, project_fields(value, fields)) for key, value in clusters.items())
+            module.exit_json(**result)
 
-        cluster_info, err = OcmClusterModule.get_cluster_info(api_instance, cluster_id)
-        result['cluster'] = cluster_info
+        if module.params['status_only']:
+            cluster_id, err = OcmClusterModule.get_cluster_id(api_instance, name)
+            if err:
+                module.fail_json(err)
+            if cluster_id:
+                status, err = OcmClusterModule.get_cluster_status(api_instance, cluster_id)
+                if err:
+                    module.fail_json(err)
+                result['status'] = status or {}
+            module.exit_json(**result)
+
+        cluster_id, cluster_info, err = OcmClusterModule.lookup_cluster(api_instance, name)
         if err:
             module.fail_json(err)
+        if not cluster_id:
+            module.exit_json(**result)
+
+        result['cluster'] = project_fields(cluster_info, cluster_fields(module.params))
         module.exit_json(**result)
 
 def main():
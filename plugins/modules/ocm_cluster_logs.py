@@ -0,0 +1,153 @@
+#!/usr/bin/python
+
+# Copyright: (c) 2021, Paul Czarkowski <pczarkowski@redhat.com>
+# GNU General Public License v3.0+ (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+from __future__ import (absolute_import, division, print_function)
+__metaclass__ = type
+
+
+DOCUMENTATION = r'''
+---
+module: ocm_cluster_logs
+
+short_description: Fetches install or uninstall logs of an OCM Cluster
+
+version_added: "1.0.0"
+
+description:
+  - Fetches install or uninstall logs of an OCM (ROSA or OSD) Cluster incrementally.
+  - Logs are fetched from a line offset so each call only transfers lines it hasn't seen yet.
+  - When C(dest) is set the logs are appended to that file instead of being returned, and the offset carries on from the lines already in the file.
+
+options:
+    name:
+        description: Name of the cluster (one of this or cluster_id is needed)
+        required: false
+        type: str
+    cluster_id:
+        description: ID of the cluster (one of this or name is needed)
+        required: false
+        type: str
+    type:
+        description: which logs to fetch
+        required: false
+        default: install
+        choices: ['install', 'uninstall']
+        type: str
+    offset:
+        description: line to start fetching from. Defaults to 0, or the number of lines already in C(dest).
+        required: false
+        type: int
+    dest:
+        description: local file to append the logs to.
+        required: false
+        type: path
+    tail:
+        description: when writing to C(dest), how many of the new lines to also return in C(content).
+        required: false
+        default: 20
+        type: int
+
+author:
+    - Paul Czarkowski (@paulczar)
+'''
+
+EXAMPLES = r'''
+- name: fetch the install logs so far
+  ocm_cluster_logs:
+    name: my-rosa-cluster
+  register: _install_logs
+
+- name: append any new install logs to a file
+  ocm_cluster_logs:
+    name: my-rosa-cluster
+    dest: "/tmp/my-rosa-cluster-install.log"
+'''
+
+RETURN = r'''
+content: str of the new log lines, or the last C(tail) of them when writing to dest
+offset: int line offset to pass to the next call to only get newer lines
+lines: int number of new lines fetched
+bytes: int number of new bytes fetched
+dest: str path the logs were written to
+api_stats: dict with the number of OCM requests, retries and 429s, and the seconds spent rate limited or backing off
+'''
+
+from ansible.module_utils.basic import AnsibleModule
+from ..module_utils.ocm import OcmModule
+from ..module_utils.ocm import OcmClusterModule
+import ocm_client
+
+
+def run_module():
+    # define available arguments/parameters a user can pass to the module
+    module_args = dict(
+        name=dict(type='str', required=False),
+        cluster_id=dict(type='str', required=False),
+        type=dict(type='str', required=False, default='install', choices=['install', 'uninstall']),
+        offset=dict(type='int', required=False),
+        dest=dict(type='path', required=False),
+        tail=dict(type='int', required=False, default=20),
+    )
+
+    result = dict(
+        changed=False,
+        content='',
+        offset=0,
+        lines=0,
+        bytes=0,
+    )
+
+    module = AnsibleModule(
+        argument_spec=module_args,
+        required_one_of=[('name', 'cluster_id')],
+        mutually_exclusive=[('name', 'cluster_id')],
+        supports_check_mode=True
+    )
+
+    if module.check_mode:
+        module.exit_json(**result)
+
+    cluster_id = module.params['cluster_id']
+    offset = module.params['offset']
+
+    with OcmModule.api_client() as api_client:
+        result['api_stats'] = api_client.stats
+        api_instance = ocm_client.DefaultApi(api_client)
+
+        if not cluster_id:
+            cluster_id, err = OcmClusterModule.get_cluster_id(api_instance, module.params['name'])
+            if err:
+                module.fail_json(err)
+            if not cluster_id:
+                module.fail_json("Unable to determin cluster_id from cluster_name: {}".format(module.params['name']))
+
+        if not module.params['dest']:
+            content, err = OcmClusterModule.get_cluster_logs(api_instance, cluster_id, module.params['type'], offset or 0)
+            if err:
+                module.fail_json(err)
+            result['content'] = content
+            result['lines'] = len(content.splitlines())
+            result['bytes'] = len(content.encode('utf-8'))
+            result['offset'] = (offset or 0) + result['lines']
+            module.exit_json(**result)
+
+        logs, err = OcmClusterModule.append_cluster_logs(api_instance, cluster_id, module.params['type'],
+                        module.params['dest'], offset)
+        if err:
+            module.fail_json(err)
+        tail = module.params['tail']
+        result['content'] = "".join(logs['new_lines'][-tail:]) if tail > 0 else ''
+        result['dest'] = logs['dest']
+        result['offset'] = logs['offset']
+        result['lines'] = logs['lines_written']
+        result['bytes'] = logs['bytes_written']
+        result['changed'] = logs['lines_written'] > 0
+        module.exit_json(**result)
+
+def main():
+    run_module()
+
+if __name__ == '__main__':
+    main()
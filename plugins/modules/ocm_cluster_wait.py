@@ -0,0 +1,177 @@
+#!/usr/bin/python
+
+# Copyright: (c) 2021, Paul Czarkowski <pczarkowski@redhat.com>
+# GNU General Public License v3.0+ (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+from __future__ import (absolute_import, division, print_function)
+__metaclass__ = type
+
+
+DOCUMENTATION = r'''
+---
+module: ocm_cluster_wait
+
+short_description: Waits for an OCM Cluster to reach a state
+
+version_added: "1.0.0"
+
+description:
+  - Waits for an OCM (ROSA or OSD) Cluster to reach one of a set of states.
+  - Polls in-process on a single authenticated session, quickly at first and near the usual completion time and less often in between.
+  - Only the small cluster status document is polled, the full cluster is fetched once the wait is over.
+  - Waiting stops if the cluster goes into C(error), the cluster is returned so the caller can decide what to do with it.
+
+options:
+    name:
+        description: Name of the cluster (one of this or cluster_id is needed)
+        required: false
+        type: str
+    cluster_id:
+        description: ID of the cluster (one of this or name is needed)
+        required: false
+        type: str
+    states:
+        description: cluster states to wait for. C(absent) waits for the cluster to be deleted.
+        required: false
+        default: ['ready']
+        type: list
+        elements: str
+    timeout:
+        description: how many seconds to wait before failing.
+        required: false
+        default: 3600
+        type: int
+    expected_duration:
+        description: roughly how many seconds the operation normally takes, polling speeds up as this gets close. Defaults to 2400 (a classic install), or 900 when waiting for C(absent). Use 900 for hosted control plane installs.
+        required: false
+        type: int
+    logs_dest:
+        description: local file to stream the install logs (or uninstall logs when waiting for C(absent)) into while waiting. Only new lines are fetched on each poll.
+        required: false
+        type: path
+    fields:
+        description: Only return these fields of the cluster, as dotted paths.
+        required: false
+        type: list
+        elements: str
+    summary:
+        description: Only return a compact summary of the cluster.
+        required: false
+        default: false
+        type: bool
+
+author:
+    - Paul Czarkowski (@paulczar)
+'''
+
+EXAMPLES = r'''
+- name: wait for cluster to be ready
+  ocm_cluster_wait:
+    name: my-rosa-cluster
+    states:
+      - ready
+    timeout: 7200
+    logs_dest: "/tmp/my-rosa-cluster-install.log"
+
+- name: wait for cluster to be deleted
+  ocm_cluster_wait:
+    name: my-rosa-cluster
+    states:
+      - absent
+    timeout: 1800
+'''
+
+RETURN = r'''
+cluster: dict of the cluster in its final state, empty when it has been deleted
+wait: dict with elapsed seconds, number of polls, whether it timed out and the time each state was first seen
+logs: dict with the path and number of lines written when using logs_dest
+api_stats: dict with the number of OCM requests, retries and 429s, and the seconds spent rate limited or backing off
+'''
+
+from ansible.module_utils.basic import AnsibleModule
+from ..module_utils.ocm import OcmModule
+from ..module_utils.ocm import OcmClusterModule
+from ..module_utils.ocm import cluster_fields, project_fields
+import ocm_client
+
+
+def run_module():
+    # define available arguments/parameters a user can pass to the module
+    module_args = dict(
+        name=dict(type='str', required=False),
+        cluster_id=dict(type='str', required=False),
+        states=dict(type='list', elements='str', required=False, default=['ready']),
+        timeout=dict(type='int', required=False, default=3600),
+        expected_duration=dict(type='int', required=False),
+        logs_dest=dict(type='path', required=False),
+        fields=dict(type='list', elements='str', required=False),
+        summary=dict(type='bool', required=False, default=False),
+    )
+
+    result = dict(
+        changed=False,
+        cluster={},
+        wait={},
+    )
+
+    module = AnsibleModule(
+        argument_spec=module_args,
+        required_one_of=[('name', 'cluster_id')],
+        mutually_exclusive=[('name', 'cluster_id')],
+        supports_check_mode=True
+    )
+
+    if module.check_mode:
+        module.exit_json(**result)
+
+    states = module.params['states']
+    cluster_id = module.params['cluster_id']
+
+    with OcmModule.api_client() as api_client:
+        result['api_stats'] = api_client.stats
+        api_instance = ocm_client.DefaultApi(api_client)
+
+        if not cluster_id:
+            cluster_id, err = OcmClusterModule.get_cluster_id(api_instance, module.params['name'], use_cache=False)
+            if err:
+                module.fail_json(err)
+            if not cluster_id:
+                if 'absent' in states:
+                    module.exit_json(**result)
+                module.fail_json("Unable to determin cluster_id from cluster_name: {}".format(module.params['name']))
+
+        on_poll = None
+        if module.params['logs_dest']:
+            log_type = 'uninstall' if 'absent' in states else 'install'
+            result['logs'] = dict(dest=module.params['logs_dest'], lines=0)
+
+            # a failed log fetch shouldn't fail the wait, we'll catch up on
+            # the next poll. the offset is tracked here rather than by
+            # counting what's in the file, and whatever was in the file from
+            # an earlier run is thrown away on the first successful fetch.
+            tail = dict(offset=0, truncate=True)
+
+            def on_poll(state):
+                logs, err = OcmClusterModule.append_cluster_logs(api_instance, cluster_id, log_type,
+                                module.params['logs_dest'], tail['offset'], tail['truncate'])
+                if not err:
+                    tail['offset'] = logs['offset']
+                    tail['truncate'] = False
+                    result['logs']['lines'] += logs['lines_written']
+
+        cluster_info, waiter, err = OcmClusterModule.wait_for_cluster(api_instance, cluster_id, states,
+                                        module.params['timeout'], module.params['expected_duration'], on_poll)
+        result['wait'] = waiter.summary()
+        if err:
+            module.fail_json(err, **result)
+        result['cluster'] = project_fields(cluster_info, cluster_fields(module.params))
+        if waiter.timed_out:
+            module.fail_json(msg="timed out after {}s waiting for cluster to be {}".format(
+                module.params['timeout'], " or ".join(states)), **result)
+        module.exit_json(**result)
+
+def main():
+    run_module()
+
+if __name__ == '__main__':
+    main()
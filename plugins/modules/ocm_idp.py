@@ -28,17 +28,39 @@ short_description: This module manages IDP for OCM / ROSA clusters
 # i.e. the version is of the form "2.5.0" and not "2.4".
 version_added: "1.0.0"
 
-description: This module manages IDP for OCM / ROSA clusters
+description:
+  - This module manages IDP for OCM / ROSA clusters
+  - It also manages who is in the cluster-admins and dedicated-admins groups. The current members of every group are fetched at once and only the users that need adding (or removing) are changed, concurrently.
 
 options:
     name:
-        description: The name of the IDP
-        required: true
+        description: The name of the IDP (needed with type)
+        required: false
         type: str
     type:
         description: type of the IDP (currently only accepts 'htpasswd')
-        required: true
+        required: false
         type: str
+    cluster_admins:
+        description: users that should be in the cluster-admins group
+        required: false
+        type: list
+        elements: str
+    dedicated_admins:
+        description: users that should be in the dedicated-admins group
+        required: false
+        type: list
+        elements: str
+    exclusive:
+        description: also remove users that aren't listed from cluster_admins and dedicated_admins. Groups that aren't given are never touched.
+        required: false
+        default: false
+        type: bool
+    concurrency:
+        description: how many group changes are made at the same time.
+        required: false
+        default: 5
+        type: int
     cluster_name:
         description: name of the OCM cluster (one of this or cluster_id needed)
         required: false
@@ -73,6 +95,16 @@ EXAMPLES = r'''
       password: 'admin1234567890!'
       username: admin
       type: htpasswd
+
+- name: make the team cluster admins
+  rh_mobb.ansible_rosa.ocm_idp:
+    cluster_name: my-rosa-cluster
+    cluster_admins:
+      - alice
+      - bob
+    dedicated_admins:
+      - carol
+    exclusive: true
 '''
 
 RETURN = r'''
@@ -97,6 +129,12 @@ type:
     type: str
     returned: always
     sample: 'HTPasswdIdentityProvider'
+groups:
+    description: for each group managed, the users added, the users removed and its members afterwards
+    type: dict
+    returned: when cluster_admins or dedicated_admins is given
+    sample: {'cluster-admins': {'added': ['bob'], 'removed': [], 'members': ['alice', 'bob']}}
+api_stats: dict with the number of OCM requests, retries and 429s, and the seconds spent rate limited or backing off
 '''
 
 from ansible.module_utils.basic import AnsibleModule
@@ -105,10 +143,6 @@ from ..module_utils.ocm import OcmIdpModule
 from ..module_utils.ocm import OcmClusterModule
 import ocm_client
 from ocm_client.rest import ApiException
-import os
-from pathlib import Path
-import json
-import requests
 
 # def check_for_existing_htpasswd(api_instance,):
 
@@ -118,10 +152,14 @@ def run_module():
     module_args = dict(
         cluster_name=dict(type='str', required=False),
         cluster_id=dict(type='str', required=False),
-        name=dict(type='str', required=True),
-        type=dict(type='str', required=True),
+        name=dict(type='str', required=False),
+        type=dict(type='str', required=False),
         username=dict(type='str', required=False),
-        password=dict(type='str', required=False),
+        password=dict(type='str', required=False, no_log=True),
+        cluster_admins=dict(type='list', elements='str', required=False),
+        dedicated_admins=dict(type='list', elements='str', required=False),
+        exclusive=dict(type='bool', required=False, default=False),
+        concurrency=dict(type='int', required=False, default=5),
     )
 
     # seed the result dict in the object
@@ -144,6 +182,8 @@ def run_module():
     # supports check mode
     module = AnsibleModule(
         argument_spec=module_args,
+        required_together=[('name', 'type')],
+        required_one_of=[('type', 'cluster_admins', 'dedicated_admins')],
         supports_check_mode=True
     )
 
@@ -168,7 +208,8 @@ def run_module():
     # with the easy checks out of the way, log into ocm so we can API
     cluster_id = module.params['cluster_id']
 
-    with ocm_client.ApiClient(OcmModule.ocm_authenticate()) as api_client:
+    with OcmModule.api_client() as api_client:
+        result['api_stats'] = api_client.stats
         api_instance = ocm_client.DefaultApi(api_client)
 
         # First, fetch the cluster_id if we don't already have it
@@ -178,25 +219,32 @@ def run_module():
                 module.fail_json(err)
             if not cluster_id:
                 module.fail_json("Unable to determin cluster_id from cluster_name: {}".format(module.params['cluster_name']))
-        # Fetch identity providers
-        existing_idps, err = OcmIdpModule.get_cluster_idps(api_instance, cluster_id)
-        if err:
-            module.fail_json(err)
+        groups = dict()
+        if module.params['cluster_admins'] is not None:
+            groups['cluster-admins'] = module.params['cluster_admins']
+        if module.params['dedicated_admins'] is not None:
+            groups['dedicated-admins'] = module.params['dedicated_admins']
 
         # process request, if its a htpasswd
+        existing_htpasswd = None
         if module.params['type'] == 'htpasswd':
+            # Fetch identity providers
+            existing_idps, err = OcmIdpModule.get_cluster_idps(api_instance, cluster_id)
+            if err:
+                module.fail_json(err)
             # find existing idp
             if existing_idps:
                 existing_htpasswd = OcmIdpModule.get_existing_htpasswd_idps(existing_idps)
-                if existing_htpasswd:
-                    if existing_htpasswd.name == module.params['name']:
-                        result['name'] = existing_htpasswd.name
-                        result['type'] = existing_htpasswd.type
-                        result['username'] = existing_htpasswd.htpasswd.username
-                        result['password'] = ''
-                        module.exit_json(**result)
-                    else:
-                        module.fail_json("an htpasswd IDP called {} already exists. OCM only supports a single IDP.".format(existing_htpasswd.name))
+                if existing_htpasswd and existing_htpasswd.name != module.params['name']:
+                    module.fail_json("an htpasswd IDP called {} already exists. OCM only supports a single IDP.".format(existing_htpasswd.name))
+            if existing_htpasswd:
+                result['name'] = existing_htpasswd.name
+                result['type'] = existing_htpasswd.type
+                result['username'] = existing_htpasswd.htpasswd.username
+                result['password'] = ''
+                if not groups:
+                    module.exit_json(**result)
+        if module.params['type'] == 'htpasswd' and not existing_htpasswd:
             # construct the htpasswd object
             identity_provider = OcmIdpModule.htpasswd_idp_builder(
                                     username=module.params['username'],
@@ -216,9 +264,23 @@ def run_module():
             result['changed'] = True
 
             # grant cluster-admin access
-            cluster_role, err = OcmIdpModule.create_cluster_role(api_instance, cluster_id, 'cluster-admins', module.params['username'])
+            if 'cluster-admins' not in groups:
+                cluster_role, err = OcmIdpModule.create_cluster_role(api_instance, cluster_id, 'cluster-admins', module.params['username'])
+                if err:
+                    module.fail_json(err)
+
+        # the htpasswd user stays a cluster admin, even with exclusive
+        if module.params['type'] == 'htpasswd' and 'cluster-admins' in groups:
+            if module.params['username'] not in groups['cluster-admins']:
+                groups['cluster-admins'] = groups['cluster-admins'] + [module.params['username']]
+
+        if groups:
+            result['groups'], err = OcmIdpModule.sync_group_members(api_instance, cluster_id, groups,
+                                        module.params['exclusive'], module.params['concurrency'])
+            if result['groups'] and any(g['added'] or g['removed'] for g in result['groups'].values()):
+                result['changed'] = True
             if err:
-                module.fail_json(err)
+                module.fail_json(err, **result)
     module.exit_json(**result)
 
 
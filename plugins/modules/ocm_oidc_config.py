@@ -80,16 +80,13 @@ oidc_config:
         type: str
         returned:  always
         sample:
+api_stats: dict with the number of OCM requests, retries and 429s, and the seconds spent rate limited or backing off
 '''
 
 from ansible.module_utils.basic import AnsibleModule
 from ..module_utils.ocm import OcmModule
 import ocm_client
 from ocm_client.rest import ApiException
-import os
-from pathlib import Path
-import json
-import requests
 
 # def check_for_existing_htpasswd(api_instance,):
 
@@ -127,7 +124,8 @@ def run_module():
     if module.check_mode:
         module.exit_json(**result)
 
-    with ocm_client.ApiClient(OcmModule.ocm_authenticate()) as api_client:
+    with OcmModule.api_client() as api_client:
+        result['api_stats'] = api_client.stats
         api_instance = ocm_client.DefaultApi(api_client)
 
         # check complex dependencies
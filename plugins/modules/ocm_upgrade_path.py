@@ -0,0 +1,177 @@
+#!/usr/bin/python
+
+# Copyright: (c) 2021, Paul Czarkowski <pczarkowski@redhat.com>
+# GNU General Public License v3.0+ (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+from __future__ import (absolute_import, division, print_function)
+__metaclass__ = type
+
+
+DOCUMENTATION = r'''
+---
+module: ocm_upgrade_path
+
+short_description: Plans OpenShift upgrade paths for OCM Clusters
+
+version_added: "1.0.0"
+
+description:
+  - Works out the shortest chain of upgrades from one OpenShift version to another.
+  - The upgrade graph is built once from the version catalog (see ocm_version_info) and cached, so planning many clusters costs a single catalog fetch.
+  - Clusters on a version that has dropped out of the catalog are planned from that version's own list of upgrades, fetched once per version.
+
+options:
+    to_version:
+        description: Version to upgrade to. A prefix like "4.15" means the newest version matching it.
+        required: true
+        type: str
+    from_version:
+        description: Version to upgrade from, for planning a single upgrade without a cluster.
+        required: false
+        type: str
+    clusters:
+        description: Clusters to plan for. Each item needs a C(name) and optionally a C(version), clusters without a version are looked up in OCM in one batch.
+        required: false
+        type: list
+        elements: dict
+    channel_group:
+        description: Channel group(s) whose versions can be used along the way.
+        required: false
+        default: ['stable']
+        type: list
+        elements: str
+    hosted_cp:
+        description: only use versions available for hosted control plane clusters.
+        required: false
+        default: false
+        type: bool
+    cache_ttl:
+        description: how many seconds the cached version catalog and upgrade graph are used before fetching them again. 0 disables the cache.
+        required: false
+        default: 3600
+        type: int
+
+author:
+    - Paul Czarkowski (@paulczar)
+'''
+
+EXAMPLES = r'''
+- name: plan an upgrade
+  ocm_upgrade_path:
+    from_version: "4.13.30"
+    to_version: "4.15"
+
+- name: plan upgrades for a fleet
+  ocm_upgrade_path:
+    to_version: "4.15.3"
+    channel_group:
+      - stable
+      - fast
+    clusters:
+      - name: cluster-a
+      - name: cluster-b
+        version: "4.14.12"
+'''
+
+RETURN = r'''
+to_version: str the version being upgraded to
+paths: dict of cluster name (or from_version) to its from version, path and number of hops
+unreachable: list of cluster names (or from_version) with no upgrade path to to_version
+api_stats: dict with the number of OCM requests, retries and 429s, and the seconds spent rate limited or backing off
+'''
+
+from ansible.module_utils.basic import AnsibleModule
+from ..module_utils.ocm import OcmModule
+from ..module_utils.ocm import OcmClusterModule
+from ..module_utils.ocm import OcmVersionModule
+import ocm_client
+
+
+def run_module():
+    # define available arguments/parameters a user can pass to the module
+    module_args = dict(
+        to_version=dict(type='str', required=True),
+        from_version=dict(type='str', required=False),
+        clusters=dict(type='list', elements='dict', required=False),
+        channel_group=dict(type='list', elements='str', required=False, default=["stable"]),
+        hosted_cp=dict(type='bool', required=False, default=False),
+        cache_ttl=dict(type='int', required=False, default=3600),
+    )
+
+    result = dict(
+        to_version=None,
+        paths={},
+        unreachable=[],
+    )
+
+    module = AnsibleModule(
+        argument_spec=module_args,
+        required_one_of=[('from_version', 'clusters')],
+        mutually_exclusive=[('from_version', 'clusters')],
+        supports_check_mode=True
+    )
+
+    if module.check_mode:
+        module.exit_json(**result)
+
+    # work out where everything is starting from
+    sources = dict()
+    if module.params['from_version']:
+        sources[module.params['from_version']] = module.params['from_version']
+    for cluster in module.params['clusters'] or []:
+        if not cluster.get('name'):
+            module.fail_json(msg="every item in clusters needs a name", **result)
+        sources[cluster['name']] = cluster.get('version')
+
+    with OcmModule.api_client() as api_client:
+        result['api_stats'] = api_client.stats
+        api_instance = ocm_client.DefaultApi(api_client)
+
+        lookup = [name for name, version in sources.items() if not version]
+        if lookup:
+            clusters, err = OcmClusterModule.search_clusters(api_instance, names=lookup)
+            if err:
+                module.fail_json(err)
+            for name in lookup:
+                sources[name] = ((clusters.get(name) or {}).get('version') or {}).get('raw_id')
+
+        graph, err = OcmVersionModule.get_upgrade_graph(api_instance, module.params['channel_group'],
+                        module.params['hosted_cp'], module.params['cache_ttl'])
+        if err:
+            module.fail_json(err)
+
+        # only versions in the catalog can be upgraded to
+        to_version = module.params['to_version']
+        if to_version not in graph:
+            latest = OcmVersionModule.latest_version(
+                OcmVersionModule.sort_versions([dict(raw_id=raw_id) for raw_id in graph]), to_version)
+            if not latest:
+                module.fail_json(msg="{} is not an available version".format(to_version), **result)
+            to_version = latest['raw_id']
+        result['to_version'] = to_version
+
+        for version in set(version for version in sources.values() if version):
+            err = OcmVersionModule.add_source_version(api_instance, graph, version)
+            if err:
+                module.fail_json(err)
+
+    # clusters on the same version share one walk of the graph
+    walks = dict()
+    for name, version in sources.items():
+        if not version:
+            result['unreachable'].append(name)
+            continue
+        if version not in walks:
+            walks[version] = OcmVersionModule.upgrade_paths_from(graph, version)
+        path = OcmVersionModule.shortest_upgrade_path(graph, version, to_version, walks[version])
+        if path is None:
+            result['unreachable'].append(name)
+            continue
+        result['paths'][name] = dict(from_version=version, path=path, hops=len(path) - 1)
+    module.exit_json(**result)
+
+def main():
+    run_module()
+
+if __name__ == '__main__':
+    main()
@@ -23,6 +23,22 @@ options:
         description: Version you want to check for.  examples 4, 4.14, 4.14.17
         required: false
         type: str
+    channel_group:
+        description: Channel group(s) to look in, for example "stable" or "fast". When more than one is given they're queried concurrently and merged, each version lists the channels it's in under C(channel_groups).
+        required: false
+        default: ['stable']
+        type: list
+        elements: str
+    hosted_cp:
+        description: only return versions available for hosted control plane clusters.
+        required: false
+        default: false
+        type: bool
+    cache_ttl:
+        description: how many seconds a locally cached copy of the version catalog is used before fetching it again. 0 disables the cache.
+        required: false
+        default: 3600
+        type: int
 
 author:
     - Paul Czarkowski (@paulczar)
@@ -31,30 +47,45 @@ author:
 EXAMPLES = r'''
 - name: get info about available versions
   ocm_version_info:
+
+- name: get the latest 4.14 patch release
+  ocm_version_info:
+    version: "4.14"
+  register: _versions
+
+- name: compare versions across channels
+  ocm_version_info:
+    version: "4.15"
+    channel_group:
+      - stable
+      - fast
+      - eus
+      - candidate
 '''
 
 RETURN = r'''
 versions:
   - 4.14.17
   - 4.14.16
+latest: newest version matching C(version), e.g. the latest patch of 4.14
+default: the channel's default version, if it matches C(version)
 # These are examples of possible return values, and in general should use other names for return values.
+api_stats: dict with the number of OCM requests, retries and 429s, and the seconds spent rate limited or backing off
 '''
 
 from ansible.module_utils.basic import *
 from ..module_utils.ocm import OcmModule
-from ..module_utils.ocm import OcmClusterModule
+from ..module_utils.ocm import OcmVersionModule
 import ocm_client
-from ocm_client.rest import ApiException
-import time
-import json
 
 
 def run_module():
     # define available arguments/parameters a user can pass to the module
     module_args = dict(
         version=dict(type='str', required=False),
-        channel_group=dict(type='str', required=False, default="stable"),
+        channel_group=dict(type='list', elements='str', required=False, default=["stable"]),
         hosted_cp=dict(type='bool', required=False, default=False),
+        cache_ttl=dict(type='int', required=False, default=3600),
     )
 
     # seed the result dict in the object
@@ -64,6 +95,8 @@ def run_module():
     # for consumption, for example, in a subsequent task
     result = dict(
         versions=[],
+        latest=None,
+        default=None,
     )
 
 
@@ -87,25 +120,22 @@ def run_module():
     hosted_cp = module.params['hosted_cp']
     channel_group = module.params['channel_group']
 
-    with ocm_client.ApiClient(OcmModule.ocm_authenticate()) as api_client:
+    with OcmModule.api_client() as api_client:
+        result['api_stats'] = api_client.stats
         api_instance = ocm_client.DefaultApi(api_client)
-        order_by = "default desc, id desc"
-        search = f"enabled = true AND channel_group = '{channel_group}'"
-        if hosted_cp:
-            search += f" AND hosted_control_plane_enabled = true"
-        else:
-            search += f" AND rosa_enabled = true"
-        if version:
-            search += f" AND raw_id like '{version}%'"
-        response = api_instance.api_clusters_mgmt_v1_versions_get(page=1,size=100,order=order_by, search=search)
-        versions = response.to_dict()['items']
-        # result['versions'] = response.to_dict()['items']
-        for raw_version in response.to_dict()['items']:
-            raw_version['version'] = raw_version['raw_id']
-            result['versions'].append(raw_version)
-        # if err:
-        #     module.fail_json(err)
-        module.exit_json(**result)
+        catalog, err = OcmVersionModule.get_channel_versions(api_instance, channel_group, hosted_cp,
+                            module.params['cache_ttl'])
+        if err:
+            module.fail_json(err)
+
+    # everything from here on is answered from the catalog, newest first
+    result['versions'] = OcmVersionModule.match_versions(catalog, version)
+    if result['versions']:
+        result['latest'] = result['versions'][0]['raw_id']
+    for raw_version in result['versions']:
+        if raw_version.get('default'):
+            result['default'] = raw_version['raw_id']
+    module.exit_json(**result)
 
 def main():
     run_module()
@@ -116,9 +116,23 @@ options:
         required: false
         type: str
     wait:
-        description: wait for up to an hour until operation is complete
+        description: wait until the cluster is ready (or gone for C(state=absent)). The cluster status is polled straight from OCM when the ocm_client library and an OCM login are available, otherwise with C(rosa describe cluster). Polling is quick at first and near the usual completion time and less often in between.
         required: false
         type: bool
+    wait_timeout:
+        description: how many seconds to wait before giving up.
+        required: false
+        default: 3600
+        type: int
+    log_dir:
+        description: stream the output of the create and delete commands to log files in this directory instead of returning it. C(commands) then only holds the log paths, byte counts and the last C(log_tail) lines of each.
+        required: false
+        type: path
+    log_tail:
+        description: how many lines from the end of each log to return when using C(log_dir).
+        required: false
+        default: 20
+        type: int
     state:
         description: the action to take
         required: false
@@ -143,6 +157,8 @@ EXAMPLES = r'''
 '''
 
 RETURN = r'''
+commands: list of the rosa commands run with their rc and output, or with log_dir their log paths, byte counts and tails
+wait: dict with elapsed seconds, number of polls, whether it timed out, the time each state was first seen and whether OCM or the rosa cli was polled
 stdout: str
 stderr: str
 password: str
@@ -152,9 +168,16 @@ password: str
 MIN_ROSA_VERSION = "1.2.22"
 
 from ansible.module_utils.basic import *
-from packaging import version as check_version
+from ..module_utils.rosa import rosa_bin, run_logged
+from ..module_utils.waiter import Waiter
+from ..module_utils.waiter import EXPECTED_INSTALL_SECONDS, EXPECTED_HCP_INSTALL_SECONDS, EXPECTED_UNINSTALL_SECONDS
+try:
+    from ..module_utils.ocm import OcmModule, OcmClusterModule
+    import ocm_client
+    HAS_OCM_CLIENT = True
+except ImportError:
+    HAS_OCM_CLIENT = False
 from semver import parse as semver_parse
-import time
 import json
 from tempfile import mkdtemp
 
@@ -187,6 +210,9 @@ def run_module():
         disable_scp_checks=dict(type='bool', required=False),
         disable_workload_monitoring=dict(type='bool', required=False, default=False),
         wait=dict(type='bool', required=False),
+        wait_timeout=dict(type='int', required=False, default=3600),
+        log_dir=dict(type='path', required=False),
+        log_tail=dict(type='int', required=False, default=20),
         state=dict(type='str', default='present', choices=['present','absent','dry-run', 'describe']),
         role_arn=dict(type='str', required=False),
         support_role_arn=dict(type='str', required=False),
@@ -223,26 +249,17 @@ def run_module():
     if module.check_mode:
         module.exit_json(**result)
 
-    # check that rosa binary exists
-    rosa = module.get_bin_path("rosa", required=True)
-    if rosa == None:
-        module.fail_json(msg='rosa cli not found in $PATH', **result)
-
-    # check that rosa is minimum version
-    # MIN_ROSA_VERSION
-    rosa_version_cmd = [rosa, "version"]
-    # rosa_version_cmd = [rosa, "version", "|", "head", "-1"]
-    rc, stdout, stderr = module.run_command(rosa_version_cmd)
-    rosa_version = stdout.rstrip().split('\n')[0]
-    if rc != 0:
-        module.fail_json(msg='could not run rosa version', **result)
-    if check_version.parse(rosa_version) < check_version.parse(MIN_ROSA_VERSION):
-        module.fail_json(msg="rosa version %s does not meet minimum of %s" % (rosa_version, MIN_ROSA_VERSION), **result)
+    # check that rosa exists and is new enough, the version is cached until
+    # the binary changes
+    rosa = rosa_bin(module, MIN_ROSA_VERSION, result)
 
     params = module.params
     state = params.pop('state')
     name = params.pop('name')
     wait = params.pop('wait')
+    wait_timeout = params.pop('wait_timeout')
+    log_dir = params.pop('log_dir')
+    log_tail = params.pop('log_tail')
     sts = params.pop('sts')
     aws_account_id = params.pop('aws_account_id')
     if not params['operator_roles_prefix']:
@@ -287,10 +304,8 @@ def run_module():
         # delete on absent
         if state == "absent":
             result['changed'] = True
-            rc, stdout, stderr = module.run_command(args)
-            reason = "delete the cluster"
-            command = " ".join(args)
-            result['commands'].append(commands(rc, stdout, stderr, reason, args))
+            rc, stderr, command = run_rosa(module, args, "delete the cluster", name, log_dir, log_tail)
+            result['commands'].append(command)
             if rc != 0:
                 module.fail_json(msg="failed to delete cluster\n%s" % (stderr), **result)
             if not wait:
@@ -302,9 +317,9 @@ def run_module():
             if state == 'present':
                 result['changed'] = True
             with tempfile.TemporaryDirectory() as tmpdirname:
-                rc, stdout, stderr = module.run_command(args, cwd=tmpdirname)
+                rc, stderr, command = run_rosa(module, args, 'create cluster', name, log_dir, log_tail, cwd=tmpdirname)
             # result['details'] = cluster_details(stdout)
-            result['commands'].append(commands(rc, stdout, stderr, 'create cluster', args))
+            result['commands'].append(command)
             if rc != 0:
                 module.fail_json(msg="failed to create cluster\n%s" % (stderr), **result)
         else:
@@ -312,23 +327,22 @@ def run_module():
             module.fail_json(msg="failed for unknown reason\n%s" % (describe_stderr), **result)
 
     if wait and state in ['present', 'absent']:
-        # ready = re.compile(r'State:\s+ready')
-        done = None
-        counter = 1
-        while not done:
-            time.sleep(60)
-            rc, stdout, stderr = rosa_describe_cluster(module, rosa, name)
-            if rc == 0 and state == 'present' and cluster_details(stdout)['ready']:
-                done = "success"
-            if rc == 1 and state == 'absent' and "There is no cluster with identifier or name" in stderr:
-                done = "success"
-            counter += 1
-            if counter > 60:
-                done = "timeout"
-
-        if done == 'timeout':
-            result['details'] = cluster_details(stdout)
-            module.fail_json(msg="cluster did not finish provisioning within an hour\n%s" % (command_result['stderr']), **result)
+        states = ['absent'] if state == 'absent' else ['ready']
+        if state == 'absent':
+            expected = EXPECTED_UNINSTALL_SECONDS
+        elif params['hosted_cp']:
+            expected = EXPECTED_HCP_INSTALL_SECONDS
+        else:
+            expected = EXPECTED_INSTALL_SECONDS
+        cluster_state, waiter, source, err = wait_for_cluster(module, rosa, name, states, wait_timeout, expected)
+        result['wait'] = waiter.summary()
+        result['wait']['source'] = source
+        if err:
+            module.fail_json(msg="failed waiting for cluster\n%s" % (err), **result)
+        if cluster_state == 'error':
+            module.fail_json(msg="cluster went into an error state", **result)
+        if waiter.timed_out:
+            module.fail_json(msg="timed out after %ss waiting for cluster to be %s" % (wait_timeout, states[0]), **result)
 
     if state == "present":
         rc, stdout, stderr = rosa_describe_cluster(module, rosa, name)
@@ -337,6 +351,69 @@ def run_module():
         result['details'] = '{"output": "successful dry-run"}'
     module.exit_json(**result)
 
+def wait_for_cluster(module, rosa, name, states, timeout, expected):
+    """Wait for the cluster to reach one of states, returns (state, waiter, source, err).
+
+    Polls the cluster status in OCM directly if we can, and only falls back
+    to forking `rosa describe cluster` for every poll when we can't. source
+    says which of 'ocm' or 'cli' was used.
+    """
+    if HAS_OCM_CLIENT:
+        try:
+            api_client = OcmModule.api_client()
+        except Exception:
+            # no usable ocm login, rosa may still have its own
+            api_client = None
+        if api_client:
+            with api_client:
+                api_instance = ocm_client.DefaultApi(api_client)
+                # the cli has just created or deleted it, so whatever is
+                # cached for the name (found or not) may be stale
+                cluster_id, err = OcmClusterModule.get_cluster_id(api_instance, name, use_cache=False)
+                if err:
+                    return None, Waiter(timeout), 'ocm', err
+                if not cluster_id and 'absent' in states:
+                    waiter = Waiter(timeout)
+                    waiter.record('absent')
+                    return 'absent', waiter, 'ocm', None
+                if cluster_id:
+                    cluster_info, waiter, err = OcmClusterModule.wait_for_cluster(api_instance, cluster_id,
+                                                    states, timeout, expected)
+                    return (cluster_info or {}).get('state', 'absent'), waiter, 'ocm', err
+
+    waiter = Waiter(timeout, expected)
+
+    def poll():
+        rc, stdout, stderr = rosa_describe_cluster(module, rosa, name)
+        if rc == 0:
+            details = cluster_details(stdout)
+            return (details.get('state') if isinstance(details, dict) else None), details
+        if "There is no cluster with identifier or name" in stderr:
+            return 'absent', {}
+        # anything else is most likely transient, try again next poll
+        return None, stderr
+
+    state, _ = waiter.wait(poll, lambda state: state in states or state == 'error')
+    return state, waiter, 'cli', None
+
+def run_rosa(module, args, reason, name, log_dir=None, log_tail=20, cwd=None):
+    """Run a rosa command, returns (rc, stderr, command) where command goes in result['commands'].
+
+    With a log_dir the output goes to files rather than into the result, and
+    stderr is just its tail.
+    """
+    if not log_dir:
+        rc, stdout, stderr = module.run_command(args, cwd=cwd)
+        return rc, stderr, commands(rc, stdout, stderr, reason, args)
+    prefix = "{}-{}".format(name, reason.replace(' ', '-'))
+    try:
+        rc, output = run_logged(args, log_dir, prefix, log_tail, cwd)
+    except (IOError, OSError) as e:
+        module.fail_json(msg="could not run %s logging to %s: %s" % (args[1], log_dir, e))
+    command = dict(reason=reason, command=" ".join(args), rc=rc)
+    command.update(output)
+    return rc, output['stderr_tail'], command
+
 def rosa_describe_cluster(module, rosa, name):
     args = [rosa, "describe", "cluster", "-c", name, "--output", "json"]
     rc, stdout, stderr = module.run_command(args)
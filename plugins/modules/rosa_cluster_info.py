@@ -12,17 +12,39 @@ DOCUMENTATION = r'''
 ---
 module: rosa_cluster_info
 
-short_description: Create Rosa Cluster
+short_description: Fetches details of ROSA Clusters
 
 version_added: "1.0.0"
 
-description: Creates ROSA (RedHat Openshift on AWS) Cluster
+description:
+  - Fetches details of one ROSA (RedHat Openshift on AWS) Cluster with C(rosa describe cluster).
+  - With C(names), or no name at all for every cluster, the clusters come from a single C(rosa list clusters) call instead. Only the clusters picked by C(describe) or C(describe_states) are then described in full, a few at a time.
 
 options:
     name:
-        description: Name of the cluster. This will be used when generating a sub-domain for your cluster on openshiftapps.com.
-        required: true
+        description: Name of the cluster to describe.
+        required: false
         type: str
+    names:
+        description: Names of the clusters to fetch. Leave this and C(name) out to fetch every cluster.
+        required: false
+        type: list
+        elements: str
+    describe:
+        description: when fetching several clusters, also describe every one of them in full.
+        required: false
+        default: false
+        type: bool
+    describe_states:
+        description: when fetching several clusters, only describe the ones in these states, for example C(error) or C(installing).
+        required: false
+        type: list
+        elements: str
+    concurrency:
+        description: how many C(rosa describe cluster) commands run at the same time.
+        required: false
+        default: 8
+        type: int
 
 author:
     - Paul Czarkowski (@paulczar)
@@ -32,9 +54,17 @@ EXAMPLES = r'''
 - name: get info about rosa cluster
   rosa_cluster_info:
     name: my-rosa-cluster
+
+- name: get every cluster, with full details for the broken ones
+  rosa_cluster_info:
+    describe_states:
+      - error
 '''
 
 RETURN = r'''
+cluster: dict of the cluster when using name
+clusters: dict of cluster name to cluster when using names or fetching every cluster
+missing: list of names that weren't found
 stdout: str
 stderr: str
 password: str
@@ -44,15 +74,20 @@ password: str
 MIN_ROSA_VERSION = "1.2.22"
 
 from ansible.module_utils.basic import *
-from packaging import version as check_version
+from ..module_utils.rosa import rosa_bin
 from semver import parse as semver_parse
 import time
 import json
+from concurrent.futures import ThreadPoolExecutor
 
 def run_module():
     # define available arguments/parameters a user can pass to the module
     module_args = dict(
-        name=dict(type='str', required=True),
+        name=dict(type='str', required=False),
+        names=dict(type='list', elements='str', required=False),
+        describe=dict(type='bool', required=False, default=False),
+        describe_states=dict(type='list', elements='str', required=False),
+        concurrency=dict(type='int', required=False, default=8),
     )
 
     # seed the result dict in the object
@@ -73,6 +108,7 @@ def run_module():
     # supports check mode
     module = AnsibleModule(
         argument_spec=module_args,
+        mutually_exclusive=[('name', 'names')],
         supports_check_mode=True
     )
 
@@ -82,25 +118,15 @@ def run_module():
     if module.check_mode:
         module.exit_json(**result)
 
-    # check that rosa binary exists
-    rosa = module.get_bin_path("rosa", required=True)
-    if rosa == None:
-        module.fail_json(msg='rosa cli not found in $PATH', **result)
-
-    # check that rosa is minimum version
-    # MIN_ROSA_VERSION
-    rosa_version_cmd = [rosa, "version"]
-    # rosa_version_cmd = [rosa, "version", "|", "head", "-1"]
-    rc, stdout, stderr = module.run_command(rosa_version_cmd)
-    rosa_version = stdout.rstrip().split('\n')[0]
-    if rc != 0:
-        module.fail_json(msg='could not run rosa version', **result)
-    if check_version.parse(rosa_version) < check_version.parse(MIN_ROSA_VERSION):
-        module.fail_json(msg="rosa version %s does not meet minimum of %s" % (rosa_version, MIN_ROSA_VERSION), **result)
+    # check that rosa exists and is new enough, the version is cached until
+    # the binary changes
+    rosa = rosa_bin(module, MIN_ROSA_VERSION, result)
 
     params = module.params
     name = params.pop('name')
 
+    if not name:
+        list_clusters(module, rosa, result)
 
     describe_args = [rosa, "describe", "cluster", "-c", name, "--output", "json"]
 
@@ -112,6 +138,43 @@ def run_module():
         result['cluster'] = cluster_details(describe_stdout)
     module.exit_json(**result)
 
+def list_clusters(module, rosa, result):
+    """Fleet mode, one `rosa list clusters` plus a describe for the ones that need it."""
+    args = [rosa, "list", "clusters", "--output", "json"]
+    rc, stdout, stderr = module.run_command(args)
+    # the listing can be huge, it's returned parsed in clusters anyway
+    result['commands'].append(commands(rc, None, stderr, args))
+    if rc != 0:
+        module.fail_json(msg="failed to list clusters\n%s" % (stderr), **result)
+    try:
+        listed = dict((cluster['name'], cluster) for cluster in json.loads(stdout or '[]'))
+    except (ValueError, KeyError, TypeError):
+        module.fail_json(msg="could not parse rosa list clusters output", **result)
+
+    names = module.params['names']
+    if names is None:
+        names = sorted(listed)
+    result['missing'] = [name for name in names if name not in listed]
+    result['clusters'] = dict((name, listed[name]) for name in names if name in listed)
+
+    states = module.params['describe_states']
+    detail = [name for name, cluster in result['clusters'].items()
+                if module.params['describe'] or (states and cluster.get('state') in states)]
+    if detail:
+        with ThreadPoolExecutor(max_workers=max(1, module.params['concurrency'])) as executor:
+            described = list(executor.map(lambda name: rosa_describe_cluster(module, rosa, name), detail))
+        for name, (rc, stdout, stderr) in zip(detail, described):
+            result['commands'].append(commands(rc, None, stderr, [rosa, "describe", "cluster", "-c", name, "--output", "json"]))
+            if rc != 0 and "There is no cluster with identifier or name" in stderr:
+                # deleted since it was listed
+                del result['clusters'][name]
+                result['missing'].append(name)
+                continue
+            if rc != 0:
+                module.fail_json(msg="failed to describe cluster %s\n%s" % (name, stderr), **result)
+            result['clusters'][name] = cluster_details(stdout)
+    module.exit_json(**result)
+
 def rosa_describe_cluster(module, rosa, name):
     args = [rosa, "describe", "cluster", "-c", name, "--output", "json"]
     rc, stdout, stderr = module.run_command(args)
@@ -0,0 +1,97 @@
+#!/usr/bin/python
+
+# Copyright: (c) 2021, Paul Czarkowski <pczarkowski@redhat.com>
+# GNU General Public License v3.0+ (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+from __future__ import (absolute_import, division, print_function)
+__metaclass__ = type
+
+
+DOCUMENTATION = r'''
+---
+module: rosa_subnet_info
+
+short_description: Fetches the subnet details a ROSA cluster needs
+
+version_added: "1.0.0"
+
+description:
+  - Fetches availability zone, VPC, CIDR and route table for a set of subnets.
+  - All of the subnets are described in one batch, and the results are cached locally so other tasks and modules in the same run (like ocm_cluster) don't describe them again.
+
+options:
+    subnet_ids:
+        description: Subnet IDs to describe, as a list or a comma separated string.
+        required: true
+        type: list
+        elements: str
+    region:
+        description: AWS region the subnets are in.
+        required: true
+        type: str
+    cache_ttl:
+        description: how many seconds cached subnet details are used before describing them again. 0 disables the cache.
+        required: false
+        default: 900
+        type: int
+
+author:
+    - Paul Czarkowski (@paulczar)
+'''
+
+EXAMPLES = r'''
+- name: get subnet details
+  rosa_subnet_info:
+    region: us-east-2
+    subnet_ids:
+      - subnet-0123456789abcdef0
+      - subnet-0fedcba9876543210
+'''
+
+RETURN = r'''
+subnets: dict of subnet id to availability_zone, availability_zone_id, vpc_id, cidr_block, map_public_ip_on_launch and route_table_id
+availability_zones: list of the distinct availability zones of the subnets, in the order given
+'''
+
+from ansible.module_utils.basic import AnsibleModule
+from ..module_utils.aws import normalize_subnet_ids, subnet_metadata
+
+
+def run_module():
+    # define available arguments/parameters a user can pass to the module
+    module_args = dict(
+        subnet_ids=dict(type='list', elements='str', required=True),
+        region=dict(type='str', required=True),
+        cache_ttl=dict(type='int', required=False, default=900),
+    )
+
+    result = dict(
+        subnets={},
+        availability_zones=[],
+    )
+
+    module = AnsibleModule(
+        argument_spec=module_args,
+        supports_check_mode=True
+    )
+
+    subnet_ids = normalize_subnet_ids(module.params['subnet_ids'])
+    subnets, err = subnet_metadata(subnet_ids, module.params['region'], module.params['cache_ttl'])
+    if err:
+        module.fail_json(msg="failed to describe subnets: {}".format(err), **result)
+
+    for subnet_id in subnet_ids:
+        if subnet_id not in subnets:
+            module.fail_json(msg="subnet {} not found in {}".format(subnet_id, module.params['region']), **result)
+        subnet = dict(subnets[subnet_id])
+        subnet.pop('cached_at', None)
+        result['subnets'][subnet_id] = subnet
+        if subnet['availability_zone'] not in result['availability_zones']:
+            result['availability_zones'].append(subnet['availability_zone'])
+    module.exit_json(**result)
+
+def main():
+    run_module()
+
+if __name__ == '__main__':
+    main()